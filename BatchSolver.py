@@ -0,0 +1,165 @@
+'''Solve many sliding puzzles in parallel from the command line (no tkinter needed).
+The input is either a text file with one board per line or a board file
+written by PuzzleGenerator. In a text file, the numbers of a board are in
+row order, separated by spaces or commas, as in Boards.SlidingPuzzle.tiles;
+the blank piece may also be written as 0.
+
+    python BatchSolver.py boards.txt --rows 4 --columns 4
+    python BatchSolver.py boards.bin --workers 8
+
+For every board, a line "index  moves  nodes  seconds" is printed as soon as
+the board is solved (so the order is not the input order); a board that
+cannot be solved gets "unsolvable" and one that crashed its worker "crashed".
+A summary of the throughput is printed to stderr at the end.
+If a worker process dies, the finished results are kept and the unfinished
+boards are retried in a new pool, in smaller chunks each time.
+'''
+
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from math import isqrt
+from PuzzleGenerator import BoardFile, MAGIC as BOARD_FILE_MAGIC
+from PuzzleSolver import IDAStar
+
+
+def readText(lines, rows = None, columns = None):
+    """ Return rows, columns and the list of boards of a text file."""
+    boards = []
+    for line in lines:
+        line = line.replace(',', ' ').split()
+        if not line:
+            continue
+        numbers = [int(number) for number in line]
+        if 0 in numbers:
+            numbers[numbers.index(0)] = len(numbers)
+        if rows is None:
+            side = isqrt(len(numbers))
+            if side * side != len(numbers):
+                raise ValueError("Give --rows and --columns for boards that are not square")
+            rows = columns = side
+        if len(numbers) != rows * columns or sorted(numbers) != list(range(1, len(numbers) + 1)):
+            raise ValueError(f"Not a {rows} x {columns} board: {' '.join(line)}")
+        boards.append(bytes(numbers))
+    return rows, columns, boards
+
+
+def readBoards(path, rows = None, columns = None):
+    """ Return rows, columns and the list of boards of a text or board file ('-' is stdin)."""
+    if path == '-':
+        return readText(sys.stdin, rows, columns)
+    with open(path, 'rb') as file:
+        binary = file.read(len(BOARD_FILE_MAGIC)) == BOARD_FILE_MAGIC
+    if binary:
+        boards = BoardFile(path)
+        return boards.rows, boards.columns, [bytes(tiles) for tiles, difficulty in boards]
+    with open(path) as file:
+        return readText(file, rows, columns)
+
+
+### Every worker process keeps one solver, so the heuristic tables
+### (and memory-mapped pattern databases) are set up once per process.
+
+_solver = None
+
+
+def startWorker(rows, columns):
+    global _solver
+    _solver = IDAStar(rows, columns)
+
+
+def solveChunk(chunk):
+    """ Solve the boards of chunk, a list of pairs (index, tiles).
+        Return a list of (index, moves, nodes, seconds); moves is None
+        for a board that cannot be solved.
+    """
+    results = []
+    for index, tiles in chunk:
+        try:
+            solution = _solver.solve(tiles)
+        except ValueError:
+            results.append((index, None, 0, 0.0))
+        else:
+            results.append((index, len(solution), solution.nodes, solution.seconds))
+    return results
+
+
+def solveAll(rows, columns, boards, workers, chunkSize, output = sys.stdout):
+    """ Solve the boards on a process pool and write a line per board to output.
+        Return the number of solved boards and the total number of nodes.
+    """
+    def write(index, moves, nodes, seconds):
+        if moves is None:
+            output.write(f"{index}\tunsolvable\n")
+        else:
+            output.write(f"{index}\t{moves}\t{nodes}\t{seconds:.6f}\n")
+
+    chunks = [list(range(start, min(start + chunkSize, len(boards))))
+              for start in range(0, len(boards), chunkSize)]
+    suspects = []
+    solved = nodes = 0
+    while chunks or suspects:
+        ### A board that was alone in a chunk of a crashed pool runs alone
+        ### in a pool of its own, so that other boards are not blamed for its crash.
+        isolated = not chunks
+        if isolated:
+            batch = [suspects.pop()]
+        else:
+            batch, chunks = chunks, []
+        with ProcessPoolExecutor(1 if isolated else workers, initializer = startWorker,
+                                 initargs = (rows, columns)) as pool:
+            futures = {pool.submit(solveChunk, [(index, boards[index]) for index in chunk]) : chunk
+                       for chunk in batch}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    ### Some worker died. Retry the chunk in halves.
+                    if isolated:
+                        output.write(f"{chunk[0]}\tcrashed\n")
+                    elif len(chunk) == 1:
+                        suspects.append(chunk)
+                    else:
+                        middle = len(chunk) // 2
+                        chunks += [chunk[:middle], chunk[middle:]]
+                    continue
+                for result in results:
+                    write(*result)
+                    if result[1] is not None:
+                        solved += 1
+                        nodes += result[2]
+                output.flush()
+    return solved, nodes
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Solve sliding puzzles optimally in parallel.")
+    parser.add_argument("input", help = "text file with one board per line, a board file, or -")
+    parser.add_argument("--rows", type = int)
+    parser.add_argument("--columns", type = int)
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--chunk", type = int, help = "boards sent to a worker at a time")
+    args = parser.parse_args(arguments)
+    if (args.rows is None) != (args.columns is None):
+        parser.error("give both --rows and --columns")
+
+    rows, columns, boards = readBoards(args.input, args.rows, args.columns)
+    ### Several chunks per worker balance the load, since the boards
+    ### differ a lot in difficulty; small chunks also lose less in a crash.
+    chunkSize = args.chunk or max(1, min(64, len(boards) // (4 * args.workers)))
+    begin = time.perf_counter()
+    solved, nodes = solveAll(rows, columns, boards, args.workers, chunkSize)
+    seconds = time.perf_counter() - begin
+    print(f"{solved} of {len(boards)} boards solved in {seconds:.2f} s: "
+          f"{solved / seconds if seconds else 0:.1f} boards/s, "
+          f"{nodes / seconds if seconds else 0:.0f} nodes/s "
+          f"({args.workers} workers, chunks of {chunkSize})", file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
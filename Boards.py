@@ -3,7 +3,52 @@ The second class represents a sliding puzzle.
 '''
 
 
+import math
+import numbers
 import random
+from array import array
+from collections.abc import Mapping, MutableMapping
+
+
+class Adjacency:
+    """ Neighbour tables of one board shape, computed once and shared by all boards
+        of the shape (see adjacency). There are two kinds of neighbours:
+        full contains all the cells in the surrounding square and sides
+        only the cells sharing a common side with the cell.
+        For example, (0, 0) and (1, 1) are neighbours in full but not in sides.
+        full and sides map a cell (i, j) to a frozenset of cells;
+        fullIndices and sidesIndices map a flat index i * columns + j
+        to a tuple of flat indices.
+    """
+    def __init__(self, rows, columns):
+        self.full = {}
+        self.sides = {}
+        self.fullIndices = []
+        self.sidesIndices = []
+        for i in range(rows):
+            for j in range(columns):
+                ### A cell is not a neighbour of itself, and the neighbours must be on the board.
+                full = tuple((i + k, j + l) for k in range(-1, 2) for l in range(-1, 2)
+                             if (k, l) != (0, 0) and 0 <= i + k < rows and 0 <= j + l < columns)
+                sides = tuple((k, l) for (k, l) in full if k == i or l == j)
+                self.full[i, j] = frozenset(full)
+                self.sides[i, j] = frozenset(sides)
+                self.fullIndices.append(tuple(k * columns + l for (k, l) in full))
+                self.sidesIndices.append(tuple(k * columns + l for (k, l) in sides))
+        self.fullIndices = tuple(self.fullIndices)
+        self.sidesIndices = tuple(self.sidesIndices)
+
+
+_adjacencies = {}
+
+
+def adjacency(rows, columns):
+    """ Return the shared Adjacency of boards with the given shape."""
+    if (rows, columns) not in _adjacencies:
+        _adjacencies[rows, columns] = Adjacency(rows, columns)
+    return _adjacencies[rows, columns]
+
+
 
 
 class SimpleBoard:
@@ -14,23 +59,18 @@ class SimpleBoard:
         self.columns = columns
         self.population = population
         self.cells = {(i, j) for i in range(self.rows) for j in range(self.columns)}
+        self.adjacency = adjacency(rows, columns)
 
-    ### Provide two methods to get the neighbours of a cell.
+    ### Provide two methods to get the neighbours of a cell (see Adjacency).
     ### The first one returns all the cells in the surrounding square.
     ### The second one requires that the cells share a common side.
-    ### For example, (0, 0) and (1, 1) are neighbours by the first but not by the second method.
+    ### Both return a shared frozenset, so nothing is computed on a call.
 
     def getNeighboursFull(self, i, j):
-        neighbours = {(i + k, j + l) for k in range(-1, 2)
-                                     for l in range(-1, 2)}
-        ### A cell is not a neighbour of itself.
-        neighbours.remove((i, j))
-        ### The set neighbours might contain negative indices.
-        return neighbours & self.cells
+        return self.adjacency.full[i, j]
 
     def getNeighbours(self, i, j):
-        remove = {(i + k, j + l) for k in range(-1, 2) for l in range(-1, 2) if k * l != 0}
-        return self.getNeighboursFull(i, j) - remove
+        return self.adjacency.sides[i, j]
 
     def swapObjects(self, i, j, k, l):
         self.population[(i, j)], self.population[(k, l)] = self.population[(k, l)], self.population[(i, j)]
@@ -38,44 +78,217 @@ class SimpleBoard:
 
 
 
+### Zobrist keys are derived from the flat index and the number with the splitmix64
+### mixing function, so hashes agree between processes and runs and large boards
+### need no tables. Boards of at most ZOBRIST_TABLE_CELLS cells share a table of the keys.
+
+ZOBRIST_TABLE_CELLS = 100
+MASK64 = (1 << 64) - 1
+_zobristKeys = {}
+
+
+def zobristKey(index, number):
+    """ Return the 64-bit key of the number at the flat index."""
+    z = (((index << 32) | number) + 1) * 0x9E3779B97F4A7C15 & MASK64
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK64
+    return z ^ (z >> 31)
+
+
+def zobristKeys(size):
+    """ Return a tuple whose item k is a tuple of the keys (see zobristKey) for the numbers
+        0, ..., size at the flat index k, or None if size > ZOBRIST_TABLE_CELLS.
+    """
+    if size > ZOBRIST_TABLE_CELLS:
+        return None
+    if size not in _zobristKeys:
+        _zobristKeys[size] = tuple(tuple(zobristKey(index, number) for number in range(size + 1))
+                                   for index in range(size))
+    return _zobristKeys[size]
+
+
+def unpack(packed, size):
+    """ Return the numbers of a board packed by SlidingPuzzle (at most 16 cells) as a list."""
+    return [((packed >> (4 * index)) & 15) + 1 for index in range(size)]
+
+
+
+
+class TileView(Mapping):
+    """ A read-only dictionary view {(i, j) : n} of the tiles of a sliding puzzle.
+        The view reads the flat tile array of the puzzle, so it is always up to date
+        and building it costs nothing.
+    """
+    def __init__(self, puzzle):
+        self.puzzle = puzzle
+
+    def __getitem__(self, cell):
+        i, j = cell
+        if not (0 <= i < self.puzzle.rows and 0 <= j < self.puzzle.columns):
+            raise KeyError(cell)
+        return self.puzzle.tiles[i * self.puzzle.columns + j]
+
+    def __iter__(self):
+        columns = self.puzzle.columns
+        return ((i, j) for i in range(self.puzzle.rows) for j in range(columns))
+
+    def __len__(self):
+        return len(self.puzzle.tiles)
+
+    def __eq__(self, other):
+        if isinstance(other, TileView):
+            return self.puzzle.tiles == other.puzzle.tiles
+        return Mapping.__eq__(self, other)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+
+
 class SlidingPuzzle(SimpleBoard):
     """ The class represents a sliding puzzle. It has numbers from 1 to rows * columns,
         and the largest number (rows * columns) represents the blank piece.
+        The board is stored in a flat array: tiles[i * columns + j] is the number at (i, j)
+        and where[n] is the flat index of the number n. The position of the blank piece
+        is cached in blank, so it never has to be searched for.
+        For sets and caches of boards, hash is a 64-bit Zobrist hash of the board and
+        packed (for boards of at most 16 cells) a 64-bit integer with four bits
+        per cell; both are updated in swapObjects.
+        misplaced is a bitset of the numbers not in their own positions (bit n for
+        the number n) and misplacedCount its size, so isSolved and hint need no scan.
     """
     def __init__(self, rows, columns):
         SimpleBoard.__init__(self, rows, columns)
         ### Initialize the board; the largest number represents the blank piece.
-        ### self.population represents the current board (it changes after clicks).
-        self.population = {(i, j) : i * self.columns + j + 1   for i in range(self.rows)
-                                                               for j in range(self.columns)}
+        ### self.tiles represents the current board (it changes after clicks).
+        size = self.rows * self.columns
+        typecode = 'B' if size < 256 else 'H' if size < 65536 else 'L'
+        self.tiles = array(typecode, range(1, size + 1))
+        ### where[0] is not used; numbers start from 1.
+        self.where = array('L', [0]) + array('L', range(size))
+        self.zobrist = zobristKeys(size)
+        self.reindex()
         ### The initial board is the solution.
         self.solution = dict(self.population)
 
+    ### self.population is kept for compatibility: it is a dictionary view of self.tiles.
+
+    @property
+    def population(self):
+        return TileView(self)
+
+    @population.setter
+    def population(self, population):
+        ### SimpleBoard.__init__ assigns None; any other value is a full board to load.
+        if population is not None:
+            self.setPositions(population)
+
+    def setPositions(self, population):
+        """ Load a board given as a dictionary {(i, j) : n}."""
+        for (i, j), number in population.items():
+            self.tiles[i * self.columns + j] = number
+        self.reindex()
+
+    def reindex(self):
+        """ Recompute where, blank, hash and packed after self.tiles has been changed directly."""
+        self.hash = 0
+        self.packed = 0 if len(self.tiles) <= 16 else None
+        self.misplaced = 0
+        self.misplacedCount = 0
+        for index, number in enumerate(self.tiles):
+            self.where[number] = index
+            self.hash ^= self.zobrist[index][number] if self.zobrist else zobristKey(index, number)
+            if self.packed is not None:
+                self.packed |= (number - 1) << (4 * index)
+            if number != index + 1:
+                self.misplaced |= 1 << number
+                self.misplacedCount += 1
+        self.blank = self.where[len(self.tiles)]
+
     def isCorrect(self, i, j):
-        return self.population[i, j] == self.solution[i, j]
+        index = i * self.columns + j
+        return self.tiles[index] == index + 1
 
     def isSolved(self):
-        return self.solution == self.population
+        return self.misplacedCount == 0
 
     def getPositions(self):
         return self.population
-    
+
     def getPositionOfBlank(self):
-        ### One could keep track of the blank piece using a variable.
-        ### This should be updated in the methods shuffle and movePieces,
-        ### but in this small board the following search will not take long.
-        for (i, j) in self.population:
-            if self.population[i, j] == self.rows * self.columns:
-                return (i, j)
-
-    ### Shuffle the board by randomly choosing neighbours of the blank piece.
-    ### Maximum size of the board will be 10 x 10, so 10,000 should be enough.
+        return divmod(self.blank, self.columns)
+
+    def swapObjects(self, i, j, k, l):
+        first, second = i * self.columns + j, k * self.columns + l
+        tiles = self.tiles
+        a, b = tiles[first], tiles[second]
+        tiles[first], tiles[second] = b, a
+        self.where[a], self.where[b] = second, first
+        if self.blank == first:
+            self.blank = second
+        elif self.blank == second:
+            self.blank = first
+        zobrist = self.zobrist
+        if zobrist:
+            self.hash ^= zobrist[first][a] ^ zobrist[first][b] ^ zobrist[second][a] ^ zobrist[second][b]
+        else:
+            self.hash ^= zobristKey(first, a) ^ zobristKey(first, b) ^ zobristKey(second, a) ^ zobristKey(second, b)
+        if self.packed is not None:
+            change = (a - 1) ^ (b - 1)
+            self.packed ^= (change << (4 * first)) ^ (change << (4 * second))
+        ### Now a is at second and b at first.
+        for number, index in ((a, second), (b, first)):
+            bit = 1 << number
+            if index == number - 1:
+                if self.misplaced & bit:
+                    self.misplaced ^= bit
+                    self.misplacedCount -= 1
+            elif not self.misplaced & bit:
+                self.misplaced |= bit
+                self.misplacedCount += 1
+
+    ### Shuffle the board. The mode "walk" randomly chooses neighbours of the blank piece;
+    ### maximum size of the board will be 10 x 10, so 10,000 steps should be enough.
+    ### The mode "permutation" picks a uniformly random solvable board directly
+    ### (see shufflePermutation). With a seed, the same board is produced every time.
     
-    def shuffle(self):
-        for k in range(10000):
-            now = self.getPositionOfBlank()
-            new = random.choice(tuple(self.getNeighbours(*(now))))
-            self.swapObjects(*(now), *(new))
+    def shuffle(self, mode = "walk", seed = None):
+        generator = random if seed is None else random.Random(seed)
+        if mode == "permutation":
+            self.shufflePermutation(generator)
+        elif mode == "walk":
+            neighbours = self.adjacency.sidesIndices
+            for k in range(10000):
+                now = self.getPositionOfBlank()
+                new = divmod(generator.choice(neighbours[self.blank]), self.columns)
+                self.swapObjects(*(now), *(new))
+        else:
+            raise ValueError(f"Unknown shuffle mode {mode!r}")
+
+    def shufflePermutation(self, generator = random):
+        """ Fisher-Yates shuffle of the tiles. Exactly half of the permutations can be solved:
+            if the parity of the permutation differs from the parity of the distance
+            of the blank piece from its own position, two pieces are swapped.
+            The swap pairs the boards one to one, so every solvable board is equally likely.
+            The shuffle starts from the solved board, so the parity is counted from it
+            and the same seed always gives the same board.
+        """
+        tiles = self.tiles
+        size = len(tiles)
+        tiles[:] = array(tiles.typecode, range(1, size + 1))
+        parity = 0
+        for i in range(size - 1, 0, -1):
+            j = generator.randrange(i + 1)
+            if j != i:
+                tiles[i], tiles[j] = tiles[j], tiles[i]
+                parity ^= 1
+        blank = tiles.index(size)
+        row, col = divmod(blank, self.columns)
+        if parity != (self.rows - 1 - row + self.columns - 1 - col) % 2:
+            first, second = [index for index in range(3) if index != blank][:2]
+            tiles[first], tiles[second] = tiles[second], tiles[first]
+        self.reindex()
 
     ### Change the positions of several pieces with one click.
     
@@ -101,75 +314,243 @@ class SlidingPuzzle(SimpleBoard):
     ### in the pieces are not shown.
     ### Find the position of the smallest number on the board
     ### which is not in a correct position.
+    ### Returns None if the puzzle is solved.
+    ### With optimal = True, return instead the position of the piece to move next
+    ### on a shortest solution (see PuzzleSolver; practical for boards up to 4 x 4).
     
-    def hint(self):
-        number = self.rows * self.columns
-        for (i, j) in self.population:
-            if not self.isCorrect(i, j) and self.population[i, j] < number:
-                number = self.population[i, j]
-                position = (i, j)
-        return position
+    def hint(self, optimal = False):
+        if optimal:
+            from PuzzleSolver import nextMove
+            return nextMove(self)
+        if self.misplaced:
+            ### The lowest bit of the bitset; the blank piece is never the only misplaced number.
+            number = (self.misplaced & -self.misplaced).bit_length() - 1
+            return divmod(self.where[number], self.columns)
 
 
 
 
 ################################################################
 ######## Under construction...
-########
-######## FIX: The isSatisfied method now uses fixed threshold of 0.5    
 ################################################################            
 
 
 
 
+def requiredNeighbours(thresholds, maxNeighbours = 8):
+    """ Return a table: required[g][n] is the smallest number of neighbours of the group g
+        that satisfies an item of the group when n neighbours are counted,
+        that is, the smallest integer s with s >= thresholds[g] * n.
+    """
+    ### The small tolerance keeps e.g. 1/3 * 3 from rounding up to 2.
+    return tuple(tuple(max(0, math.ceil(threshold * n - 1e-9)) for n in range(maxNeighbours + 1))
+                 for threshold in thresholds)
+
+
+
+
+class CellView(MutableMapping):
+    """ A dictionary view {(i, j) : colour} of the cells of MovingItems.
+        Setting a cell calls MovingItems.setCell, so the counters stay up to date.
+    """
+    def __init__(self, items):
+        self.items = items
+
+    def __getitem__(self, cell):
+        i, j = cell
+        if not (0 <= i < self.items.rows and 0 <= j < self.items.columns):
+            raise KeyError(cell)
+        return self.items.colours[self.items.grid[i * self.items.columns + j]]
+
+    def __setitem__(self, cell, colour):
+        self.items.setCell(*cell, colour)
+
+    def __delitem__(self, cell):
+        raise TypeError("Cells cannot be removed from the board")
+
+    def __iter__(self):
+        columns = self.items.columns
+        return ((i, j) for i in range(self.items.rows) for j in range(columns))
+
+    def __len__(self):
+        return len(self.items.grid)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+
+
 class MovingItems(SimpleBoard):
-    """ Represents a population (of two colours) living on a board.
+    """ Represents a population of several groups living on a board.
         Each cell requires a certain amount of similar neighbours to be satisfied.
         Unsatisfied blocks moves to another position on the board.
-        Population is meant to be a dictionary (i, j) : red OR blue OR white.
-        (i, j) is a cell on the board and white represents unpopulated cell.
+        Population is meant to be a dictionary (i, j) : colour, and
+        colours[0] (white by default) represents unpopulated cell.
+        The other colours are the groups; internally they are coded as small integers
+        (the position in colours) in the bytearray grid, grid[i * columns + j].
+        An item of the group g is satisfied if at least the fraction thresholds[g]
+        of its populated neighbours belong to g. With countVacant = True, the empty
+        neighbour cells are counted as well. The defaults (blue and red, threshold 0.5)
+        mean that an item needs at least as many similar neighbours as others.
+        The numbers of neighbours of each group of every cell and the set of unsatisfied
+        cells are kept up to date, so a move only updates the neighbours of two cells.
+        The empty cells are kept in a list with swap-remove, so a random empty cell
+        is found in constant time.
+        Change the population with setCell (or through the dictionary view population).
+        With a seed, the empty cells are chosen by a private random.Random,
+        so a simulation can be repeated exactly.
+        Objects in the list observers are told about every change: cellChanged(index, old, new)
+        after a cell has changed and rebuild() after recount (see NeighboursMetrics).
     """    
-    def __init__(self, rows, columns, population = None):
-        SimpleBoard.__init__(self, rows, columns, population)
+    def __init__(self, rows, columns, population = None, colours = ('white', 'blue', 'red'),
+                 thresholds = 0.5, countVacant = False, seed = None):
+        self.random = random if seed is None else random.Random(seed)
+        self.observers = []
+        self.colours = tuple(colours)
+        self.codes = {colour : code for code, colour in enumerate(self.colours)}
+        self.grid = bytearray(rows * columns)
+        SimpleBoard.__init__(self, rows, columns)
+        ### thresholds is one fraction for all groups or one for each group.
+        if isinstance(thresholds, numbers.Real):
+            thresholds = [thresholds] * (len(self.colours) - 1)
+        self.thresholds = (0,) + tuple(thresholds)
+        self.required = requiredNeighbours(self.thresholds)
+        self.countVacant = countVacant
+        if population is not None:
+            self.population = population
+        else:
+            self.recount()
+
+    ### self.population is a dictionary view of self.grid.
+
+    @property
+    def population(self):
+        return CellView(self)
+
+    @population.setter
+    def population(self, population):
+        ### SimpleBoard.__init__ assigns None; any other value is a full board to load.
+        if population is not None:
+            for (i, j), colour in population.items():
+                self.grid[i * self.columns + j] = self.codes[colour]
+            self.recount()
+
+    def recount(self):
+        """ Compute the neighbour counters and the unsatisfied cells from scratch.
+            Call this after changing self.grid directly.
+        """
+        size = self.rows * self.columns
+        ### counts[index * stride + g] is the number of neighbours of the group g
+        ### (g = 0 for empty cells) of the cell with the flat index.
+        self.stride = len(self.colours)
+        self.counts = bytearray(size * self.stride)
+        self.unsatisfied = set()
+        ### free lists the empty cells and freePosition[index] is the position
+        ### of index in free (-1 if the cell is populated).
+        self.free = []
+        self.freePosition = [-1] * size
+        for index, code in enumerate(self.grid):
+            if code == 0:
+                self.addFree(index)
+            for other in self.adjacency.fullIndices[index]:
+                self.counts[other * self.stride + code] += 1
+        for index in range(size):
+            self.updateSatisfaction(index)
+        for observer in self.observers:
+            observer.rebuild()
+
+    def updateSatisfaction(self, index):
+        if self.satisfied(index):
+            self.unsatisfied.discard(index)
+        else:
+            self.unsatisfied.add(index)
+
+    def satisfied(self, index):
+        """ isSatisfied for a flat index. Empty cells are always satisfied."""
+        code = self.grid[index]
+        if code == 0:
+            return True
+        neighbours = len(self.adjacency.fullIndices[index])
+        if not self.countVacant:
+            neighbours -= self.counts[index * self.stride]
+        return self.counts[index * self.stride + code] >= self.required[code][neighbours]
+
+    def addFree(self, index):
+        self.freePosition[index] = len(self.free)
+        self.free.append(index)
+
+    def removeFree(self, index):
+        ### Move the last free cell to the place of index.
+        position = self.freePosition[index]
+        last = self.free.pop()
+        if last != index:
+            self.free[position] = last
+            self.freePosition[last] = position
+        self.freePosition[index] = -1
+
+    def setCell(self, i, j, colour):
+        """ Change the colour of a cell and update the counters of its neighbours."""
+        self.setCode(i * self.columns + j, self.codes[colour])
+
+    def setCode(self, index, code):
+        """ setCell for a flat index and a group code."""
+        old = self.grid[index]
+        if old == code:
+            return
+        self.grid[index] = code
+        if old == 0:
+            self.removeFree(index)
+        elif code == 0:
+            self.addFree(index)
+        counts, stride = self.counts, self.stride
+        neighbours = self.adjacency.fullIndices[index]
+        for other in neighbours:
+            counts[other * stride + old] -= 1
+            counts[other * stride + code] += 1
+        self.updateSatisfaction(index)
+        for other in neighbours:
+            self.updateSatisfaction(other)
+        for observer in self.observers:
+            observer.cellChanged(index, old, code)
 
     def populatedCells(self):
         """ Return the set of populated cells."""
-        return {(i, j) for (i, j) in self.population
-                       if self.population[i, j] != 'white'}
+        return {divmod(index, self.columns) for index, code in enumerate(self.grid) if code}
 
     def getNeighbours(self, i, j):
         """ Return the set of populated neighbour cells."""
         neighbourCells = SimpleBoard.getNeighboursFull(self, i, j)
-        return {(k, l) for (k, l) in neighbourCells if (k, l) in self.populatedCells()}
+        return {(k, l) for (k, l) in neighbourCells if self.grid[k * self.columns + l]}
 
     def typesOfNeighbours(self, i, j):
-        """ Return the number of blue and red neighbours."""
-        neghbs = [self.population[k, l] for (k, l) in self.getNeighbours(i, j)]
-        return neghbs.count('blue'), neghbs.count('red')
+        """ Return the numbers of neighbours of each group, e.g. blue and red by default."""
+        start = (i * self.columns + j) * self.stride
+        return tuple(self.counts[start + 1 : start + self.stride])
 
     def isSatisfied(self, i, j):
-        ### Else statement applies if (i, j) is a white cell.
-        blue = self.typesOfNeighbours(i, j)[0]
-        red  = self.typesOfNeighbours(i, j)[1]
-        if self.population[i, j] == 'blue':
-            return blue >= red
-        else:
-            return red >= blue
+        return self.satisfied(i * self.columns + j)
 
     def unsatisfiedCells(self):
-        return {(i, j) for (i, j) in self.populatedCells() if not self.isSatisfied(i, j)}
+        return {divmod(index, self.columns) for index in self.unsatisfied}
 
     def getEmptyCell(self):
-        emptyCells = self.cells - self.populatedCells()
-        return random.choice(tuple(emptyCells))
+        return divmod(self.random.choice(self.free), self.columns)
 
     def move(self, i, j):
         """ Move an item to some empty cell."""
-        newCell = self.getEmptyCell()
-        self.population[newCell] = self.population[i, j]
-        self.population[i, j] = 'white'
+        self.moveIndex(i * self.columns + j)
+
+    def moveIndex(self, index):
+        target = self.random.choice(self.free)
+        self.setCode(target, self.grid[index])
+        self.setCode(index, 0)
 
     def moveUnsatisfied(self):
-        for i, j in self.unsatisfiedCells():
-            self.move(i, j)
+        ### The cells unsatisfied at the start all move, even if earlier moves satisfy them.
+        ### They move in a random order; the set would give the order of the indices.
+        movers = list(self.unsatisfied)
+        self.random.shuffle(movers)
+        for index in movers:
+            self.moveIndex(index)
 
@@ -0,0 +1,180 @@
+'''Exact distance tables for small sliding puzzles (at most MAX_CELLS cells, e.g. 3 x 3 and 2 x 4).
+Every board is a permutation of the numbers 1, ..., rows * columns (see Boards.SlidingPuzzle),
+and its Lehmer rank is an index to a table with one byte per permutation:
+the number of moves in a shortest solution, or UNSOLVABLE.
+The table is computed once by a breadth-first search from the solved board
+and saved next to this module:
+
+    python DistanceTables.py 3 3
+
+File layout (little-endian): magic b'SPDT', version (H), rows (B), columns (B),
+followed by the table.
+'''
+
+
+import mmap
+import os
+import struct
+import sys
+from PuzzleSolver import adjacentIndices
+
+
+MAGIC = b'SPDT'
+VERSION = 1
+HEADER = '<4sHBB'
+UNSOLVABLE = 255
+MAX_CELLS = 9
+
+
+def lehmerRank(tiles):
+    """ Rank of the permutation tiles in lexicographic order; the solved board has rank 0."""
+    size = len(tiles)
+    result = 0
+    for i in range(size):
+        number = tiles[i]
+        smaller = 0
+        for j in range(i + 1, size):
+            if tiles[j] < number:
+                smaller += 1
+        result = result * (size - i) + smaller
+    return result
+
+
+def lehmerUnrank(value, size):
+    """ Return the permutation of 1, ..., size with the given rank as a bytearray."""
+    digits = bytearray(size)
+    for i in range(size - 1, -1, -1):
+        value, digits[i] = divmod(value, size - i)
+    unused = list(range(1, size + 1))
+    return bytearray(unused.pop(digit) for digit in digits)
+
+
+def defaultPath(rows, columns):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"dist-{rows}x{columns}.bin")
+
+
+def buildTable(rows, columns):
+    """ Return a bytearray indexed by Lehmer rank with the distances to the solved board."""
+    size = rows * columns
+    if size > MAX_CELLS:
+        raise ValueError(f"Distance tables are only for boards with at most {MAX_CELLS} cells")
+    adjacent = adjacentIndices(rows, columns)
+    count = 1
+    for k in range(2, size + 1):
+        count *= k
+    table = bytearray([UNSOLVABLE]) * count
+    goal = bytes(range(1, size + 1))
+    table[0] = 0
+    frontier = [goal]
+    depth = 0
+    while frontier:
+        depth += 1
+        following = []
+        for board in frontier:
+            board = bytearray(board)
+            blank = board.index(size)
+            for target in adjacent[blank]:
+                board[blank], board[target] = board[target], size
+                index = lehmerRank(board)
+                if table[index] == UNSOLVABLE:
+                    table[index] = depth
+                    following.append(bytes(board))
+                board[target], board[blank] = board[blank], size
+        frontier = following
+    return table
+
+
+
+
+class DistanceTable:
+    """ The table of one board size. table is any sequence of bytes
+        (a bytearray or a memory-mapped file).
+    """
+    def __init__(self, rows, columns, table):
+        self.rows = rows
+        self.columns = columns
+        self.table = table
+        self.adjacent = adjacentIndices(rows, columns)
+
+    def distance(self, tiles):
+        """ Number of moves in a shortest solution, or None if tiles cannot be solved."""
+        value = self.table[lehmerRank(tiles)]
+        return None if value == UNSOLVABLE else value
+
+    def nextMove(self, tiles):
+        """ Return the flat index of the piece to move next on a shortest solution,
+            or None if the board is solved or cannot be solved. tiles has to be
+            mutable (e.g. SlidingPuzzle.tiles); it is changed only temporarily.
+        """
+        size = len(tiles)
+        current = self.table[lehmerRank(tiles)]
+        if current == 0 or current == UNSOLVABLE:
+            return None
+        blank = 0
+        while tiles[blank] != size:
+            blank += 1
+        for target in self.adjacent[blank]:
+            tiles[blank], tiles[target] = tiles[target], size
+            value = self.table[lehmerRank(tiles)]
+            tiles[target], tiles[blank] = tiles[blank], size
+            if value == current - 1:
+                return target
+
+    def save(self, path):
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(struct.pack(HEADER, MAGIC, VERSION, self.rows, self.columns))
+            file.write(self.table)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            memory = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, rows, columns = struct.unpack_from(HEADER, memory)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a distance table")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, expected {VERSION}; rebuild it")
+        return cls(rows, columns, memoryview(memory)[struct.calcsize(HEADER):])
+
+
+### Tables are opened once per process.
+_opened = {}
+
+
+def find(rows, columns):
+    """ Return the table of the default file for the board size, or None if not built."""
+    if (rows, columns) not in _opened:
+        path = defaultPath(rows, columns)
+        if not os.path.exists(path):
+            return None
+        _opened[rows, columns] = DistanceTable.load(path)
+    return _opened[rows, columns]
+
+
+def forSize(rows, columns):
+    """ Return the table for the board size, building and saving it if necessary.
+        Return None if the board is too large for an exact table.
+    """
+    if rows * columns > MAX_CELLS:
+        return None
+    table = find(rows, columns)
+    if table is None:
+        table = DistanceTable(rows, columns, buildTable(rows, columns))
+        try:
+            table.save(defaultPath(rows, columns))
+        except OSError:
+            ### The table works from memory as well.
+            pass
+        _opened[rows, columns] = table
+    return table
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python DistanceTables.py ROWS COLUMNS")
+    rows, columns = int(sys.argv[1]), int(sys.argv[2])
+    table = DistanceTable(rows, columns, buildTable(rows, columns))
+    table.save(defaultPath(rows, columns))
+    print(defaultPath(rows, columns))
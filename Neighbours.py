@@ -3,20 +3,32 @@ two types of blocks, red and blue, living in an area. Each block
 needs to have a certain amount of similar neighbours.
 Otherwise, they will move into another location.
 
-FIX: Stop simulation when the board stabilizes. The current value is 20 iterations,
-but for small boards this is too much.
+The simulation stops when the board stabilizes (see NeighboursRunner).
 
 The "Unhappy button" is used only for testing.
+
+Given a history file (see NeighboursHistory), the simulation plays it back:
+the slider shows the board after any step of the recorded run.
+
+    python Neighbours.py run.hist
+
+The board is drawn with one rectangle per cell (renderer = "items") or into
+a single image (renderer = "image"). Either way, only the cells changed since
+the last redraw are drawn again.
 '''
 
 from Boards import MovingItems
+from NeighboursHistory import History
+from NeighboursRunner import Runner
 from tkinter import *
 import random
+import sys
 
 
 class NeighboursSimulation:
-    def __init__(self, testing = False):
+    def __init__(self, testing = False, history = None, renderer = "items"):
         self.testing = testing
+        self.history = History(history) if history is not None else None
         root = Tk()
 
         ########################################################################
@@ -32,7 +44,16 @@ class NeighboursSimulation:
         for i in range(n):
             for j in range(n):
                 self.population[i, j] = random.choice(['red', 'blue', 'white'])
-        self.process = MovingItems(n, n, self.population)
+        if self.history is not None:
+            rows, columns = self.history.rows, self.history.columns
+            self.cellSize = self.canvasSize / max(rows, columns)
+            self.process = MovingItems(rows, columns, colours = self.history.colours)
+            self.process.grid[:] = self.history.grid(0)
+            self.process.recount()
+        else:
+            self.process = MovingItems(n, n, self.population)
+        ### From now on, self.population is a view of the board of self.process.
+        self.population = self.process.population
         ########################################################################
         ### Requires cleaning...
         ########################################################################
@@ -42,6 +63,7 @@ class NeighboursSimulation:
                              height = self.canvasSize,
                              bg = "white")
         self.canvas.pack()
+        self.createCells(renderer)
         self.printBoard()
 
         ### User may create red, blue, and white cells on the board using the mouse buttons.
@@ -61,71 +83,113 @@ class NeighboursSimulation:
         button = Button(frame, text = "Unhappy", command = self.unhappy).grid(row = 1, column = 2)
         button = Button(frame, text = "Move unhappy", command = self.moveUnhappy).grid(row = 1, column = 3)
         button = Button(frame, text = "Start", command = self.start).grid(row = 1, column = 4)
+        if self.history is not None:
+            scale = Scale(frame, from_ = 0, to = len(self.history) - 1, orient = HORIZONTAL,
+                          label = "Step", length = self.canvasSize, command = self.showStep)
+            scale.grid(row = 2, column = 1, columnspan = 4)
 
         root.mainloop()
 
+    ########################################################################
+    ### The cells are drawn once; later only the cells changed on the board
+    ### (reported to cellChanged by self.process) are drawn again.
+    ########################################################################
+    def createCells(self, renderer):
+        self.renderer = renderer
+        if renderer == "image":
+            self.image = PhotoImage(width = self.canvasSize, height = self.canvasSize)
+            self.canvas.create_image(0, 0, anchor = NW, image = self.image)
+        else:
+            self.cellItems = {(i, j) : self.canvas.create_rectangle(j * self.cellSize, i * self.cellSize,
+                                                                     (j + 1) * self.cellSize, (i + 1) * self.cellSize)
+                              for i, j in self.population}
+        self.dirty = set(self.population)
+        self.process.observers.append(self)
+
+    def cellChanged(self, index, old, new):
+        self.dirty.add(divmod(index, self.process.columns))
+
+    def rebuild(self):
+        self.dirty = set(self.population)
+
     def printCell(self, i, j):
-        self.canvas.create_rectangle(j * self.cellSize, i * self.cellSize,
-                                     (j + 1) * self.cellSize, (i + 1) * self.cellSize,
-                                     fill = self.population[i, j])
+        colour = self.population[i, j]
+        if self.renderer == "image":
+            self.image.put(colour, to = (round(j * self.cellSize), round(i * self.cellSize),
+                                         round((j + 1) * self.cellSize), round((i + 1) * self.cellSize)))
+        else:
+            self.canvas.itemconfigure(self.cellItems[i, j], fill = colour)
 
     def printBoard(self):
-        for i, j in self.population:
+        self.canvas.delete("labels")
+        for i, j in self.dirty:
             self.printCell(i, j)
+        self.dirty.clear()
 
     def leftButton(self, event):
         i, j = int(event.y / self.cellSize), int(event.x / self.cellSize)
-        self.population[i, j] = "red"
-        self.printCell(i, j)
+        self.process.setCell(i, j, "red")
+        self.printBoard()
         
     def leftDoubleButton1(self, event):
         i, j = int(event.y / self.cellSize), int(event.x / self.cellSize)
-        self.population[i, j] = "blue"
-        self.printCell(i, j)
+        self.process.setCell(i, j, "blue")
+        self.printBoard()
 
     def rightButton(self, event):
         i, j = int(event.y / self.cellSize), int(event.x / self.cellSize)
-        self.population[i, j] = "white"
-        self.printCell(i, j)
+        self.process.setCell(i, j, "white")
+        self.printBoard()
 
     ### Create a random population.
     def randomBoard(self):
         for i, j in self.population:
-            self.population[i, j] = random.choice(['red', 'blue', 'white'])
+            self.process.setCell(i, j, random.choice(['red', 'blue', 'white']))
         self.printBoard()
 
     def unhappy(self):
+        populated = self.process.populatedCells()
+        unsatisfied = self.process.unsatisfiedCells()
         for (i, j) in self.population:
-            if (i, j) in self.process.populatedCells():
+            if (i, j) in populated:
                 self.canvas.create_text(self.cellSize * (j + 0.25),
                                     self.cellSize * (i + 0.25),
                                     text = "b: " + str(self.process.typesOfNeighbours(i, j)[0]),
-                                    font = "Times 12")
+                                    font = "Times 12", tags = "labels")
                 self.canvas.create_text(self.cellSize * (j + 0.25),
                                     self.cellSize * (i + 0.75),
                                     text = "r: " + str(self.process.typesOfNeighbours(i, j)[1]),
-                                    font = "Times 12")
-                if (i, j) in self.process.unsatisfiedCells():
+                                    font = "Times 12", tags = "labels")
+                if (i, j) in unsatisfied:
                     self.canvas.create_text(self.cellSize * (j + 0.75),
                                     self.cellSize * (i + 0.5),
                                     text = "X",
-                                    font = "Times 12")
+                                    font = "Times 12", tags = "labels")
 
     def moveUnhappy(self):
         self.process.moveUnsatisfied()
         self.printBoard()
 
+    def showStep(self, step):
+        ### Show the board of the history after step.
+        ### Only the cells that differ are set, so only they are drawn again.
+        grid = self.history.grid(int(step))
+        for index, (old, new) in enumerate(zip(self.process.grid, grid)):
+            if old != new:
+                self.process.setCode(index, new)
+        self.printBoard()
+
     def start(self):
-        ### The board stabilizes quite fast. For 20 x 20, 20 iterations is too much.
-        for i in range(20):
-            self.process.moveUnsatisfied()
+        ### The runner stops as soon as the board stabilizes.
+        runner = Runner(self.process, maxIterations = 100)
+        for stats in runner.steps():
             self.printBoard()
             self.canvas.update()
             self.canvas.after(500)
-        self.canvas.create_text(200, 200, text = "Finished", font = "Times 48")
+        self.canvas.create_text(200, 200, text = "Finished", font = "Times 48", tags = "labels")
 
 
 
 
-NeighboursSimulation(True)
+NeighboursSimulation(True, sys.argv[1] if len(sys.argv) > 1 else None)
 
@@ -0,0 +1,148 @@
+'''A NumPy engine for the segregation model of Boards.MovingItems (requires numpy).
+The board is an integer array: EMPTY (0) for white cells and 1, ..., groups
+for the items (BLUE and RED by default), as in MovingItems.grid.
+The numbers of neighbours of each group are computed for every cell at once
+from shifted copies of the board, and all unsatisfied items are relocated
+together, with the same rules as MovingItems.isSatisfied and moveUnsatisfied.
+'''
+
+
+import numbers
+import numpy as np
+from Boards import requiredNeighbours
+
+
+EMPTY, BLUE, RED = 0, 1, 2
+COLOURS = ('white', 'blue', 'red')
+CODES = {colour : code for code, colour in enumerate(COLOURS)}
+
+
+def neighbourCounts(grid, code):
+    """ Return an array with the number of neighbours of type code (in the surrounding
+        square) for every cell of grid.
+    """
+    rows, columns = grid.shape
+    padded = np.pad(grid == code, 1).astype(np.uint8)
+    counts = np.zeros((rows, columns), np.uint8)
+    for k in range(3):
+        for l in range(3):
+            if (k, l) != (1, 1):
+                counts += padded[k : k + rows, l : l + columns]
+    return counts
+
+
+### The number of cells around every cell (fewer at the edges), for each shape of board.
+_cellNeighbours = {}
+
+
+def cellNeighbours(shape):
+    """ Return a read-only array of the number of cells around every cell of a board of shape."""
+    if shape not in _cellNeighbours:
+        neighbours = neighbourCounts(np.ones(shape, np.uint8), 1)
+        neighbours.flags.writeable = False
+        _cellNeighbours[shape] = neighbours
+    return _cellNeighbours[shape]
+
+
+def unsatisfiedMask(grid, required, countVacant = False):
+    """ Return a boolean array of the unsatisfied items of grid (see MovingItems).
+        required is the table of requiredNeighbours as an array. Cells outside
+        grid do not count as neighbours.
+    """
+    counts = [neighbourCounts(grid, code) for code in range(len(required))]
+    same = np.choose(grid, counts)
+    neighbours = cellNeighbours(grid.shape)
+    counted = neighbours if countVacant else neighbours - counts[EMPTY]
+    return (grid != EMPTY) & (same < required[grid, counted])
+
+
+def relocate(movers, empties, generator):
+    """ Return the target cells of movers (flat indices, in the order they move)
+        when every mover in turn goes to a random empty cell and leaves its own
+        cell empty, as in MovingItems.moveUnsatisfied (with the movers shuffled
+        first, as both do).
+        The empty cells form a pool of constant size: mover t takes the cell at
+        a random slot of the pool and puts its own cell in the slot. So mover t
+        gets the original empty cell of its slot, unless an earlier mover used the
+        same slot; then it gets the cell left by the latest such mover.
+    """
+    count = len(movers)
+    slots = generator.integers(0, len(empties), size = count)
+    ### Sort by slot, and by time within a slot.
+    order = np.lexsort((np.arange(count), slots))
+    sortedSlots = slots[order]
+    first = np.ones(count, bool)
+    first[1:] = sortedSlots[1:] != sortedSlots[:-1]
+    previous = np.empty(count, movers.dtype)
+    previous[1:] = movers[order[:-1]]
+    targets = np.empty(count, movers.dtype)
+    targets[order] = np.where(first, empties[sortedSlots], previous)
+    return targets
+
+
+
+
+class GridEngine:
+    """ grid is a two-dimensional array of group codes; colours names the codes.
+        thresholds and countVacant are as in MovingItems.
+        seed makes the relocations reproducible.
+    """
+    def __init__(self, grid, seed = None, colours = COLOURS, thresholds = 0.5, countVacant = False):
+        self.grid = np.array(grid, dtype = np.uint8)
+        self.rows, self.columns = self.grid.shape
+        self.colours = tuple(colours)
+        if isinstance(thresholds, numbers.Real):
+            thresholds = [thresholds] * (len(self.colours) - 1)
+        self.required = np.array(requiredNeighbours((0,) + tuple(thresholds)), np.uint8)
+        self.countVacant = countVacant
+        self.generator = np.random.default_rng(seed)
+
+    @classmethod
+    def fromPopulation(cls, rows, columns, population, seed = None, colours = COLOURS, **rules):
+        """ Create an engine from a dictionary (i, j) : colour."""
+        codes = {colour : code for code, colour in enumerate(colours)}
+        grid = np.zeros((rows, columns), np.uint8)
+        for (i, j), colour in population.items():
+            grid[i, j] = codes[colour]
+        return cls(grid, seed, colours, **rules)
+
+    @classmethod
+    def fromItems(cls, items, seed = None):
+        """ Create an engine with the board and the rules of a MovingItems."""
+        grid = np.frombuffer(items.grid, np.uint8).reshape(items.rows, items.columns)
+        return cls(grid, seed, items.colours, items.thresholds[1:], items.countVacant)
+
+    def toPopulation(self):
+        """ Return the board as a dictionary for MovingItems and NeighboursSimulation."""
+        return {(i, j) : self.colours[code] for (i, j), code in np.ndenumerate(self.grid)}
+
+    def typesOfNeighbours(self):
+        """ Return a list of arrays: the numbers of neighbours of each group
+            (blue and red by default) for every cell.
+        """
+        return [neighbourCounts(self.grid, code) for code in range(1, len(self.colours))]
+
+    def unsatisfied(self):
+        """ Return a boolean array of the unsatisfied items (see MovingItems)."""
+        return unsatisfiedMask(self.grid, self.required, self.countVacant)
+
+    def step(self):
+        """ Move all unsatisfied items to random empty cells. Return the number of moves.
+            Nothing moves if the board has no empty cells.
+        """
+        return moveAll(self.grid.reshape(-1), np.flatnonzero(self.unsatisfied()), self.generator)
+
+
+def moveAll(flat, movers, generator):
+    """ Move the items at the flat indices movers of the flat board to random empty cells,
+        in a random order. Return the number of moves (0 if there are no empty cells).
+    """
+    empties = np.flatnonzero(flat == EMPTY)
+    if len(movers) == 0 or len(empties) == 0:
+        return 0
+    movers = generator.permutation(movers)
+    targets = relocate(movers, empties, generator)
+    items = flat[movers]
+    flat[movers] = EMPTY
+    flat[targets] = items
+    return len(movers)
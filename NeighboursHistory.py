@@ -0,0 +1,206 @@
+'''A binary history of a run of Boards.MovingItems, for playback without rerunning.
+HistoryWriter observes the board (see MovingItems.observers) and appends one
+record per step to a file; History reads the file through mmap, so any step of
+a run of many gigabytes can be shown without loading the file into memory.
+
+The file starts with a header: the magic b'SNHL', the version, the numbers of
+rows and columns, and the colours of the codes as UTF-8 text separated by commas.
+Then come the records, one per step starting with step 0 (the initial board).
+A record is a kind (KEYFRAME or CHANGES), the step and a count, followed by
+    KEYFRAME - the whole grid, rows * columns bytes (the codes of MovingItems.grid),
+    CHANGES  - count little-endian uint32 cell indices, then count uint8 codes:
+               the cells changed since the previous step and their new codes.
+A keyframe is written every keyframeInterval steps (or every step with
+frames = True), so a step is found by applying at most keyframeInterval - 1
+change records to the previous keyframe. A record cut off at the end of the
+file (an interrupted run) is ignored.
+
+    python NeighboursHistory.py --size 200 --output run.hist
+    python Neighbours.py run.hist
+'''
+
+
+import argparse
+import bisect
+import mmap
+import struct
+import sys
+from array import array
+from NeighboursRunner import Runner, randomItems
+
+
+MAGIC = b'SNHL'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIH')
+RECORD = struct.Struct('<BII')
+KEYFRAME, CHANGES = 0, 1
+
+
+class HistoryWriter:
+    """ Appends the steps of items (a MovingItems) to a new file at path.
+        Call record after every step (for example, for every step of a Runner)
+        and close at the end, or use the writer in a with statement.
+    """
+    def __init__(self, path, items, keyframeInterval = 100, frames = False):
+        self.items = items
+        self.keyframeInterval = keyframeInterval
+        self.frames = frames
+        self.file = open(path, 'wb')
+        colours = ','.join(items.colours).encode('utf-8')
+        self.file.write(HEADER.pack(MAGIC, VERSION, items.rows, items.columns, len(colours)))
+        self.file.write(colours)
+        self.step = 0
+        self.changes = {}
+        self.writeKeyframe()
+        items.observers.append(self)
+
+    def writeKeyframe(self):
+        grid = self.items.grid
+        self.file.write(RECORD.pack(KEYFRAME, self.step, len(grid)))
+        self.file.write(grid)
+        self.full = False
+
+    def writeChanges(self):
+        indices = array('I', self.changes)
+        if sys.byteorder == 'big':
+            indices.byteswap()
+        self.file.write(RECORD.pack(CHANGES, self.step, len(indices)))
+        self.file.write(indices.tobytes())
+        self.file.write(bytes(self.changes.values()))
+
+    def record(self):
+        """ Append the changes made since the previous step as the next step."""
+        self.step += 1
+        if self.frames or self.full or self.step % self.keyframeInterval == 0:
+            self.writeKeyframe()
+        else:
+            self.writeChanges()
+        self.changes.clear()
+
+    def close(self):
+        if self.items is not None:
+            self.items.observers.remove(self)
+            self.items = None
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    ### Observer of MovingItems
+
+    def cellChanged(self, index, old, new):
+        ### Only the last code of a cell in a step matters.
+        self.changes[index] = new
+
+    def rebuild(self):
+        ### The whole board may have changed.
+        self.full = True
+
+
+class History:
+    """ A history file opened read-only through mmap. len gives the number of steps,
+        grid(step) the board after step, population(step) the same as a dictionary.
+        Going forward from the last step asked for only applies the new changes.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.rows, self.columns, length = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a history file of version {VERSION}")
+        start = HEADER.size
+        self.colours = tuple(self.map[start : start + length].decode('utf-8').split(','))
+        self.cells = self.rows * self.columns
+        self.offsets = array('Q')
+        self.keyframes = array('L')
+        self.scan(start + length)
+        self.cached = None
+        self.cachedStep = None
+
+    def scan(self, offset):
+        """ Find the record of every step from the record headers."""
+        end = len(self.map)
+        while offset + RECORD.size <= end:
+            kind, step, count = RECORD.unpack_from(self.map, offset)
+            size = RECORD.size + (self.cells if kind == KEYFRAME else 5 * count)
+            if offset + size > end:
+                break
+            if kind == KEYFRAME:
+                self.keyframes.append(step)
+            self.offsets.append(offset)
+            offset += size
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def apply(self, grid, step):
+        offset = self.offsets[step]
+        kind, recorded, count = RECORD.unpack_from(self.map, offset)
+        offset += RECORD.size
+        if kind == KEYFRAME:
+            grid[:] = self.map[offset : offset + self.cells]
+            return
+        indices = array('I', self.map[offset : offset + 4 * count])
+        if sys.byteorder == 'big':
+            indices.byteswap()
+        codes = self.map[offset + 4 * count : offset + 5 * count]
+        for index, code in zip(indices, codes):
+            grid[index] = code
+
+    def grid(self, step):
+        """ Return the board after step as a bytearray, as MovingItems.grid."""
+        if not 0 <= step < len(self):
+            raise IndexError(f"step {step} is not in the history")
+        keyframe = self.keyframes[bisect.bisect_right(self.keyframes, step) - 1]
+        if self.cachedStep is not None and keyframe <= self.cachedStep <= step:
+            first = self.cachedStep + 1
+        else:
+            self.cached = bytearray(self.cells)
+            first = keyframe
+        for recorded in range(first, step + 1):
+            self.apply(self.cached, recorded)
+        self.cachedStep = step
+        return bytearray(self.cached)
+
+    def population(self, step):
+        """ Return the board after step as a dictionary (i, j) : colour."""
+        grid = self.grid(step)
+        return {(i, j) : self.colours[grid[i * self.columns + j]]
+                for i in range(self.rows) for j in range(self.columns)}
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Run the segregation model and record its history.")
+    parser.add_argument("--size", type = int, default = 200)
+    parser.add_argument("--density", type = float, default = 0.9)
+    parser.add_argument("--threshold", type = float, default = 0.5)
+    parser.add_argument("--seed", type = int)
+    parser.add_argument("--iterations", type = int, default = 1000)
+    parser.add_argument("--keyframes", type = int, default = 100, help = "steps between keyframes")
+    parser.add_argument("--frames", action = 'store_true', help = "write the whole board every step")
+    parser.add_argument("--output", required = True)
+    args = parser.parse_args(arguments)
+
+    items = randomItems(args.size, args.size, args.density, seed = args.seed,
+                        thresholds = args.threshold)
+    runner = Runner(items, args.iterations)
+    with HistoryWriter(args.output, items, args.keyframes, args.frames) as writer:
+        for stats in runner.steps():
+            writer.record()
+    print(f"{len(runner.stats)} steps written to {args.output}: {runner.reason}", file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
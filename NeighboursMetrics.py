@@ -0,0 +1,198 @@
+'''Segregation metrics of a Boards.MovingItems, updated as the items move.
+SegregationMetrics observes the board (see MovingItems.observers) and keeps
+    similarity     - the mean fraction of similar neighbours among the populated
+                     neighbours of the items (items without populated neighbours
+                     are not counted),
+    dissimilarity  - the dissimilarity index over square blocks of the board:
+                     the share of the items that would have to move to other blocks
+                     for every block to have the group mix of the whole board
+                     (the multi-group form; for two groups it is Duncan's index),
+    largest        - the size of the largest cluster of items of one group,
+                     connected through the surrounding squares.
+The first two are exact after every change. The clusters are kept in a union-find
+structure. Joining clusters is exact, but a cluster is never split when an item
+leaves it, so between rebuilds the largest cluster may be overestimated; the
+structure is rebuilt after rebuildAfter removals, or on request.
+'''
+
+
+class SegregationMetrics:
+    """ Metrics of items (a MovingItems); blockSize is the side of the blocks
+        of the dissimilarity index. Call detach to stop following the board.
+    """
+    def __init__(self, items, blockSize = 5, rebuildAfter = None):
+        self.items = items
+        self.blockSize = blockSize
+        size = items.rows * items.columns
+        self.rebuildAfter = rebuildAfter if rebuildAfter is not None else max(100, size // 10)
+        ### The block of every cell.
+        blocksPerRow = -(-items.columns // blockSize)
+        self.blockOf = [(i // blockSize) * blocksPerRow + j // blockSize
+                        for i in range(items.rows) for j in range(items.columns)]
+        self.blockCount = max(self.blockOf) + 1
+        self.rebuild()
+        items.observers.append(self)
+
+    def detach(self):
+        self.items.observers.remove(self)
+
+    def rebuild(self):
+        """ Compute all metrics from the board."""
+        items = self.items
+        size = len(items.grid)
+        groups = len(items.colours)
+        ### Similarity: the fraction of every item, their sum and number.
+        self.fraction = [None] * size
+        self.fractionSum = 0.0
+        self.fractionCount = 0
+        for index in range(size):
+            self.updateFraction(index)
+        ### Dissimilarity: the group counts of every block and of the whole board.
+        self.blockCounts = [[0] * groups for block in range(self.blockCount)]
+        self.totals = [0] * groups
+        for index, code in enumerate(items.grid):
+            if code:
+                self.blockCounts[self.blockOf[index]][code] += 1
+                self.totals[code] += 1
+        self.computeDissimilarity()
+        ### Clusters: union-find over nodes; every item placed on a cell gets a new node.
+        self.parent = []
+        self.size = []
+        self.nodeOf = [-1] * size
+        self.removals = 0
+        self.largest = 0
+        for index, code in enumerate(items.grid):
+            if code:
+                self.addNode(index, code)
+        self.largestStale = False
+
+    ### Similarity
+
+    def updateFraction(self, index):
+        items = self.items
+        old = self.fraction[index]
+        if old is not None:
+            self.fractionSum -= old
+            self.fractionCount -= 1
+        new = None
+        code = items.grid[index]
+        if code:
+            base = index * items.stride
+            populated = len(items.adjacency.fullIndices[index]) - items.counts[base]
+            if populated:
+                new = items.counts[base + code] / populated
+                self.fractionSum += new
+                self.fractionCount += 1
+        self.fraction[index] = new
+
+    def similarity(self):
+        return self.fractionSum / self.fractionCount if self.fractionCount else 0.0
+
+    ### Dissimilarity
+
+    def blockTerm(self, block):
+        counts = self.blockCounts[block]
+        share = sum(counts) / self.population
+        return sum(abs(counts[code] - share * self.totals[code]) for code in range(1, len(counts)))
+
+    def computeDissimilarity(self):
+        """ Compute the sum of the block terms; needed when the totals change."""
+        self.population = sum(self.totals)
+        self.changedBlocks = set()
+        self.computedTotals = list(self.totals)
+        if not self.population:
+            self.terms = [0.0] * self.blockCount
+        else:
+            self.terms = [self.blockTerm(block) for block in range(self.blockCount)]
+        self.termSum = sum(self.terms)
+
+    def dissimilarity(self):
+        if self.totals != self.computedTotals:
+            self.computeDissimilarity()
+        for block in self.changedBlocks:
+            term = self.blockTerm(block)
+            self.termSum += term - self.terms[block]
+            self.terms[block] = term
+        self.changedBlocks.clear()
+        population = self.population
+        if not population:
+            return 0.0
+        interaction = sum(total / population * (1 - total / population) for total in self.totals[1:])
+        return self.termSum / (2 * population * interaction) if interaction else 0.0
+
+    ### Clusters
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def addNode(self, index, code):
+        node = len(self.parent)
+        self.parent.append(node)
+        self.size.append(1)
+        self.nodeOf[index] = node
+        if not self.largest:
+            self.largest = 1
+        grid = self.items.grid
+        nodeOf = self.nodeOf
+        for other in self.items.adjacency.fullIndices[index]:
+            ### During rebuild, the items after index have no nodes yet.
+            if grid[other] == code and nodeOf[other] >= 0:
+                self.union(node, nodeOf[other])
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        if self.size[first] > self.largest:
+            self.largest = self.size[first]
+
+    def removeNode(self, index):
+        ### The node stays in the structure; only the size of its cluster changes.
+        root = self.find(self.nodeOf[index])
+        if self.size[root] == self.largest:
+            self.largestStale = True
+        self.size[root] -= 1
+        self.nodeOf[index] = -1
+        self.removals += 1
+
+    def largestCluster(self, exact = False):
+        """ The size of the largest cluster; exact = True rebuilds the clusters if needed."""
+        if exact and self.removals:
+            self.rebuild()
+        elif self.largestStale:
+            self.largest = max((self.size[node] for node in range(len(self.parent))
+                                if self.parent[node] == node), default = 0)
+            self.largestStale = False
+        return self.largest
+
+    ### Observer of MovingItems
+
+    def cellChanged(self, index, old, new):
+        for other in (index,) + self.items.adjacency.fullIndices[index]:
+            self.updateFraction(other)
+        block = self.blockOf[index]
+        if old:
+            self.blockCounts[block][old] -= 1
+            self.totals[old] -= 1
+            self.removeNode(index)
+        if new:
+            self.blockCounts[block][new] += 1
+            self.totals[new] += 1
+            self.addNode(index, new)
+        self.changedBlocks.add(block)
+        if self.removals >= self.rebuildAfter:
+            self.rebuild()
+
+    def sample(self, exact = False):
+        """ Return the metrics as a dictionary."""
+        return {"similarity" : self.similarity(),
+                "dissimilarity" : self.dissimilarity(),
+                "largestCluster" : self.largestCluster(exact)}
@@ -0,0 +1,130 @@
+'''Run the segregation model of Boards.MovingItems without a GUI.
+The simulation moves the unsatisfied items until one of the following happens:
+    stable   - every item is satisfied,
+    cycle    - the board is the same as after some earlier step,
+    plateau  - the number of unsatisfied items has not reached a new minimum
+               in the last patience steps,
+    blocked  - some items are unsatisfied, but there are no empty cells,
+    limit    - maxIterations steps have been taken.
+Every step produces a StepStats. NeighboursSimulation uses the runner step by step
+to redraw the board; batch jobs call run().
+
+    python NeighboursRunner.py --size 100 --density 0.9 --seed 1
+'''
+
+
+import argparse
+import random
+import time
+from Boards import MovingItems
+
+
+def randomItems(rows, columns, density = 0.9, mix = None, seed = None,
+                colours = ('white', 'blue', 'red'), **rules):
+    """ Return a MovingItems where each cell is populated with the probability density.
+        mix gives the relative weights of the groups (equal by default).
+        rules (thresholds, countVacant) are passed to MovingItems.
+    """
+    generator = random.Random(seed)
+    groups = colours[1:]
+    if mix is None:
+        mix = [1] * len(groups)
+    population = {}
+    for i in range(rows):
+        for j in range(columns):
+            if generator.random() < density:
+                population[i, j] = generator.choices(groups, mix)[0]
+            else:
+                population[i, j] = colours[0]
+    return MovingItems(rows, columns, population, colours, seed = generator.getrandbits(64), **rules)
+
+
+
+
+class StepStats:
+    """ Statistics of one step: the number of moved items, the number of
+        unsatisfied items after the step, and the time used in seconds.
+    """
+    def __init__(self, iteration, moves, unsatisfied, seconds):
+        self.iteration = iteration
+        self.moves = moves
+        self.unsatisfied = unsatisfied
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"StepStats({self.iteration}, moves = {self.moves}, " \
+               f"unsatisfied = {self.unsatisfied}, seconds = {self.seconds:.4f})"
+
+
+
+
+class Runner:
+    """ Runs a MovingItems until it stops (see the module documentation).
+        After the run, reason tells why it stopped and stats holds the steps.
+    """
+    def __init__(self, items, maxIterations = 1000, patience = 50):
+        self.items = items
+        self.maxIterations = maxIterations
+        self.patience = patience
+        self.reason = None
+        self.stats = []
+
+    def steps(self):
+        """ Move the unsatisfied items step by step, yielding a StepStats after each step."""
+        items = self.items
+        seen = {hash(bytes(items.grid))}
+        best, sinceBest = len(items.unsatisfied), 0
+        for iteration in range(1, self.maxIterations + 1):
+            if not items.unsatisfied:
+                self.reason = "stable"
+                return
+            if not items.free:
+                self.reason = "blocked"
+                return
+            begin = time.perf_counter()
+            moves = len(items.unsatisfied)
+            items.moveUnsatisfied()
+            stats = StepStats(iteration, moves, len(items.unsatisfied), time.perf_counter() - begin)
+            self.stats.append(stats)
+            yield stats
+
+            state = hash(bytes(items.grid))
+            if state in seen:
+                self.reason = "cycle"
+                return
+            seen.add(state)
+            if stats.unsatisfied < best:
+                best, sinceBest = stats.unsatisfied, 0
+            else:
+                sinceBest += 1
+                if sinceBest >= self.patience:
+                    self.reason = "plateau"
+                    return
+        self.reason = "stable" if not items.unsatisfied else "limit"
+
+    def run(self):
+        """ Run to the end and return the list of StepStats."""
+        for stats in self.steps():
+            pass
+        return self.stats
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Run the segregation model until it stops.")
+    parser.add_argument("--size", type = int, default = 50)
+    parser.add_argument("--density", type = float, default = 0.9)
+    parser.add_argument("--threshold", type = float, default = 0.5)
+    parser.add_argument("--seed", type = int)
+    parser.add_argument("--iterations", type = int, default = 1000)
+    args = parser.parse_args(arguments)
+
+    items = randomItems(args.size, args.size, args.density, seed = args.seed,
+                        thresholds = args.threshold)
+    runner = Runner(items, args.iterations)
+    for stats in runner.steps():
+        print(stats)
+    print(f"Stopped after {len(runner.stats)} steps: {runner.reason}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+'''Run the segregation model of Boards.MovingItems over a grid of parameters
+on a process pool. Every combination of size, density, group mix and threshold
+is run replicates times. The seed of a run is derived from the base seed and
+the parameters of the run, so a run gives the same result whenever and
+wherever it is computed.
+
+The results are written to a JSON-lines file as the runs finish, one object
+per run with its parameters, the final segregation metrics (see NeighboursMetrics)
+and the number of iterations. If the file already exists, the runs in it are skipped, so an
+interrupted sweep continues where it stopped.
+
+    python NeighboursSweep.py --sizes 20 50 --densities 0.8 0.9 \\
+        --mixes 1:1 2:1 --thresholds 0.3 0.5 0.7 --replicates 5 --output sweep.jsonl
+'''
+
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from NeighboursMetrics import SegregationMetrics
+from NeighboursRunner import Runner, randomItems
+
+
+def runKey(parameters):
+    """ A string identifying a run; the same parameters always give the same key."""
+    return json.dumps(parameters, sort_keys = True)
+
+
+def runSeed(baseSeed, parameters):
+    """ A 64-bit seed for the run, independent of the order the runs are made in."""
+    digest = hashlib.sha256(f"{baseSeed}:{runKey(parameters)}".encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def runOne(parameters, seed, maxIterations):
+    """ Run the model with the parameters and return a dictionary of the results."""
+    size = parameters["size"]
+    items = randomItems(size, size, parameters["density"], parameters["mix"], seed,
+                        colours = ['white'] + [f"group{g}" for g in range(1, len(parameters["mix"]) + 1)],
+                        thresholds = parameters["threshold"])
+    runner = Runner(items, maxIterations)
+    stats = runner.run()
+    populated = len(items.grid) - len(items.free)
+    result = {"parameters" : parameters,
+              "seed" : seed,
+              "iterations" : len(stats),
+              "reason" : runner.reason,
+              "moves" : sum(step.moves for step in stats),
+              "unsatisfied" : len(items.unsatisfied) / populated if populated else 0.0,
+              "seconds" : sum(step.seconds for step in stats)}
+    result.update(SegregationMetrics(items).sample())
+    return result
+
+
+def combinations(sizes, densities, mixes, thresholds, replicates):
+    for size, density, mix, threshold, replicate in itertools.product(
+            sizes, densities, mixes, thresholds, range(replicates)):
+        ### The numbers are floats however they were given, so the key and seed of a run
+        ### do not depend on writing 1:1 or leaving the default (1, 1).
+        yield {"size" : size, "density" : float(density), "mix" : [float(weight) for weight in mix],
+               "threshold" : float(threshold), "replicate" : replicate}
+
+
+def finishedRuns(path):
+    """ Return the keys of the runs in an existing output file.
+        A last line cut off by an interruption is removed from the file.
+    """
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, 'rb+') as file:
+        data = file.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            file.truncate(end)
+    for line in data[:end].splitlines():
+        if line.strip():
+            finished.add(runKey(json.loads(line)["parameters"]))
+    return finished
+
+
+def sweep(runs, output, baseSeed = 0, workers = None, maxIterations = 1000):
+    """ Run the parameter dictionaries runs that are not yet in the file output.
+        Return the number of runs made.
+    """
+    finished = finishedRuns(output)
+    pending = [parameters for parameters in runs if runKey(parameters) not in finished]
+    with open(output, 'a') as file, ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(runOne, parameters, runSeed(baseSeed, parameters), maxIterations)
+                   for parameters in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            file.write(json.dumps(future.result()) + '\n')
+            file.flush()
+            print(f"\r{done} / {len(pending)} runs", end = '', file = sys.stderr)
+    print(file = sys.stderr)
+    return len(pending)
+
+
+def parseMix(text):
+    return tuple(float(weight) for weight in text.split(':'))
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Parameter sweep of the segregation model.")
+    parser.add_argument("--sizes", type = int, nargs = '+', default = [20])
+    parser.add_argument("--densities", type = float, nargs = '+', default = [0.9])
+    parser.add_argument("--mixes", type = parseMix, nargs = '+', default = [(1, 1)],
+                        help = "relative sizes of the groups, e.g. 1:1 or 2:1:1")
+    parser.add_argument("--thresholds", type = float, nargs = '+', default = [0.5])
+    parser.add_argument("--replicates", type = int, default = 1)
+    parser.add_argument("--seed", type = int, default = 0, help = "base seed of the sweep")
+    parser.add_argument("--iterations", type = int, default = 1000)
+    parser.add_argument("--workers", type = int)
+    parser.add_argument("--output", required = True)
+    args = parser.parse_args(arguments)
+
+    runs = combinations(args.sizes, args.densities, args.mixes, args.thresholds, args.replicates)
+    count = sweep(runs, args.output, args.seed, args.workers, args.iterations)
+    print(f"{count} runs written to {args.output}", file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
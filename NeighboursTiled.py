@@ -0,0 +1,139 @@
+'''A multi-core version of NeighboursEngine.GridEngine for boards of millions of cells
+(requires numpy). The board is kept in multiprocessing.shared_memory and split
+into tiles of rows. In every step, worker processes find the unsatisfied items
+of their tiles; a tile is read together with one halo row above and below,
+so the neighbour counts at the tile borders are exact. The main process
+then relocates all the unsatisfied items to empty cells at once.
+
+The step has the semantics of MovingItems.moveUnsatisfied: the items unsatisfied
+at the start of the step move one by one, in a random order, each to an empty cell
+chosen uniformly at the time of its move (see NeighboursEngine.relocate).
+So the results are statistically the same as those of the serial model,
+also in where on the board the freed cells are taken.
+
+    python NeighboursTiled.py --size 2000 --workers 4 --steps 10
+'''
+
+
+import argparse
+import numbers
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from NeighboursEngine import COLOURS, moveAll, unsatisfiedMask
+from Boards import requiredNeighbours
+
+
+def attach(name):
+    """ Open an existing shared memory block without taking over its clean-up."""
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        ### Before Python 3.13 the block is always tracked, but the workers share
+        ### the resource tracker of the main process, so registering again is harmless.
+        return shared_memory.SharedMemory(name)
+
+
+### State of a worker process, set by startWorker.
+
+_memory = None
+_grid = None
+_required = None
+_countVacant = None
+
+
+def startWorker(name, shape, required, countVacant):
+    global _memory, _grid, _required, _countVacant
+    _memory = attach(name)
+    _grid = np.ndarray(shape, np.uint8, _memory.buf)
+    _required = required
+    _countVacant = countVacant
+
+
+def tileMovers(first, last):
+    """ Return the flat indices of the unsatisfied items in the rows first, ..., last - 1."""
+    top = max(first - 1, 0)
+    bottom = min(last + 1, _grid.shape[0])
+    mask = unsatisfiedMask(_grid[top : bottom], _required, _countVacant)
+    tile = mask[first - top : first - top + last - first]
+    return np.flatnonzero(tile) + first * _grid.shape[1]
+
+
+
+
+class TiledEngine:
+    """ grid is a two-dimensional array of group codes, and colours, thresholds
+        and countVacant are as in MovingItems. The tiles have tileRows rows;
+        by default there are four tiles per worker.
+        Use the engine in a with statement (or call close) to free the shared memory.
+    """
+    def __init__(self, grid, workers = None, tileRows = None, seed = None,
+                 colours = COLOURS, thresholds = 0.5, countVacant = False):
+        grid = np.asarray(grid, np.uint8)
+        self.rows, self.columns = grid.shape
+        self.colours = tuple(colours)
+        if isinstance(thresholds, numbers.Real):
+            thresholds = [thresholds] * (len(self.colours) - 1)
+        required = np.array(requiredNeighbours((0,) + tuple(thresholds)), np.uint8)
+        self.generator = np.random.default_rng(seed)
+
+        self.memory = shared_memory.SharedMemory(create = True, size = grid.size)
+        self.grid = np.ndarray(grid.shape, np.uint8, self.memory.buf)
+        self.grid[:] = grid
+        workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(workers, initializer = startWorker,
+                                        initargs = (self.memory.name, grid.shape, required, countVacant))
+        if tileRows is None:
+            tileRows = max(1, -(-self.rows // (4 * workers)))
+        self.tiles = [(first, min(first + tileRows, self.rows))
+                      for first in range(0, self.rows, tileRows)]
+
+    def unsatisfied(self):
+        """ Return the flat indices of all unsatisfied items, computed by the workers."""
+        ### The workers read the board only while no one writes it.
+        parts = list(self.pool.map(tileMovers, *zip(*self.tiles)))
+        return np.concatenate(parts)
+
+    def step(self):
+        """ Move all unsatisfied items to random empty cells. Return the number of moves."""
+        return moveAll(self.grid.reshape(-1), self.unsatisfied(), self.generator)
+
+    def close(self):
+        self.pool.shutdown()
+        ### Drop the array before the buffer it uses.
+        self.grid = None
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Run the segregation model on many cores.")
+    parser.add_argument("--size", type = int, default = 2000)
+    parser.add_argument("--density", type = float, default = 0.9)
+    parser.add_argument("--workers", type = int)
+    parser.add_argument("--steps", type = int, default = 10)
+    parser.add_argument("--seed", type = int)
+    args = parser.parse_args(arguments)
+
+    generator = np.random.default_rng(args.seed)
+    populated = generator.random((args.size, args.size)) < args.density
+    grid = np.where(populated, generator.integers(1, 3, (args.size, args.size)), 0)
+    with TiledEngine(grid, args.workers, seed = args.seed) as engine:
+        for step in range(1, args.steps + 1):
+            begin = time.perf_counter()
+            moves = engine.step()
+            print(f"step {step}: {moves} moves in {time.perf_counter() - begin:.3f} s")
+            if moves == 0:
+                break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+'''Disjoint additive pattern databases for the sliding puzzle.
+The numbers of the board (without the blank piece) are split into groups.
+For every group, a table gives the number of moves of the pieces of the group
+needed to bring them to their own positions, for every placement of the group.
+Moves of the other pieces are free, so the values of different groups can be added,
+and the sum is an admissible heuristic for PuzzleSolver.IDAStar.
+
+The tables are built once by a breadth-first search backwards from the solved board:
+
+    python PatternDatabases.py 4 4
+    python PatternDatabases.py 4 4 --partition "1,5,6,9,10,13 7,8,11,12,14,15 2,3,4"
+
+They are saved as one byte per placement in a versioned file, and later
+processes map the file to memory with mmap, so loading is instant and
+several solver processes share the same pages.
+
+File layout (little-endian):
+    header:  magic b'SPDB', version (H), rows (B), columns (B), number of groups (B)
+    groups:  size k (B), the k numbers (B each), offset (Q), length (Q)
+    tables:  one byte per placement, at the given offsets
+'''
+
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from PuzzleSolver import adjacentIndices
+
+
+MAGIC = b'SPDB'
+VERSION = 1
+UNKNOWN = 255
+
+### 6-6-3 for the 15-puzzle and 5-5-5-5-4 for the 24-puzzle.
+DEFAULT_PARTITIONS = {
+    (4, 4): ((1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4)),
+    (5, 5): ((1, 2, 3, 6, 7), (4, 5, 8, 9, 10), (11, 12, 16, 17, 21),
+             (13, 14, 15, 18, 19), (20, 22, 23, 24)),
+}
+
+
+def defaultPath(rows, columns):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"pdb-{rows}x{columns}.bin")
+
+
+def tableSize(cells, k):
+    """ Number of ways to place k distinct pieces on cells cells."""
+    size = 1
+    for i in range(k):
+        size *= cells - i
+    return size
+
+
+def rank(positions, cells):
+    """ Rank of the placement positions (distinct flat indices) among all
+        placements of len(positions) pieces; 0 <= rank < tableSize(cells, k).
+    """
+    result = 0
+    for i, position in enumerate(positions):
+        smaller = 0
+        for previous in positions[:i]:
+            if previous < position:
+                smaller += 1
+        result = result * (cells - i) + position - smaller
+    return result
+
+
+def unrank(value, k, cells):
+    """ Inverse of rank."""
+    digits = [0] * k
+    for i in range(k - 1, -1, -1):
+        value, digits[i] = divmod(value, cells - i)
+    positions = []
+    for digit in digits:
+        ### The digit counts the unused cells before the position.
+        position = digit
+        for previous in sorted(positions):
+            if previous <= position:
+                position += 1
+        positions.append(position)
+    return positions
+
+
+def buildTable(rows, columns, group):
+    """ Return a bytearray with the pattern distances of the numbers in group.
+        A state is a placement of the group together with the region of cells
+        where the blank piece can move without moving pieces of the group;
+        the region is represented by its smallest cell.
+    """
+    cells = rows * columns
+    k = len(group)
+    adjacent = adjacentIndices(rows, columns)
+    table = bytearray([UNKNOWN]) * tableSize(cells, k)
+    visited = bytearray(len(table) * cells)
+
+    def region(occupied, blank):
+        ### Flood fill of the blank piece over the cells not in occupied.
+        stack = [blank]
+        seen = {blank}
+        while stack:
+            index = stack.pop()
+            for other in adjacent[index]:
+                if other not in seen and other not in occupied:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    goal = [number - 1 for number in group]
+    start = rank(goal, cells)
+    frontier = array('Q', [start * cells + min(region(set(goal), cells - 1))])
+    visited[frontier[0]] = 1
+    depth = 0
+    while frontier:
+        following = array('Q')
+        for state in frontier:
+            value, blank = divmod(state, cells)
+            if table[value] == UNKNOWN:
+                ### A smaller value is still admissible.
+                table[value] = min(depth, UNKNOWN - 1)
+            positions = unrank(value, k, cells)
+            occupied = set(positions)
+            free = region(occupied, blank)
+            ### A piece of the group next to the region moves into it;
+            ### its old cell becomes the blank piece.
+            for piece, position in enumerate(positions):
+                for other in adjacent[position]:
+                    if other in free:
+                        positions[piece] = other
+                        newBlank = min(region(occupied - {position} | {other}, position))
+                        newState = rank(positions, cells) * cells + newBlank
+                        if not visited[newState]:
+                            visited[newState] = 1
+                            following.append(newState)
+                        positions[piece] = position
+        frontier = following
+        depth += 1
+    return table
+
+
+def build(rows, columns, partition = None, path = None):
+    """ Build the tables of the partition (a sequence of groups of numbers)
+        and save them to path. Return the path.
+    """
+    if partition is None:
+        partition = DEFAULT_PARTITIONS[rows, columns]
+    if path is None:
+        path = defaultPath(rows, columns)
+    numbers = sorted(number for group in partition for number in group)
+    if numbers != list(range(1, rows * columns)):
+        raise ValueError("The groups must contain every number except the blank exactly once")
+    tables = []
+    for group in partition:
+        print(f"Building the table of {group}...", file = sys.stderr)
+        tables.append(buildTable(rows, columns, group))
+    save(path, rows, columns, partition, tables)
+    return path
+
+
+def save(path, rows, columns, partition, tables):
+    headerSize = struct.calcsize('<4sHBBB') + \
+                 sum(1 + len(group) + struct.calcsize('<QQ') for group in partition)
+    ### Align the tables at 8 bytes.
+    offset = (headerSize + 7) // 8 * 8
+    header = struct.pack('<4sHBBB', MAGIC, VERSION, rows, columns, len(partition))
+    for group, table in zip(partition, tables):
+        header += struct.pack('<B', len(group)) + bytes(group) + struct.pack('<QQ', offset, len(table))
+        offset += (len(table) + 7) // 8 * 8
+    ### Write to a temporary file first, so a reader never sees a half-written database.
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header)
+        for table in tables:
+            file.write(bytes(-file.tell() % 8))
+            file.write(table)
+    os.replace(temporary, path)
+
+
+
+
+class PatternDatabase:
+    """ The tables of a database file, mapped to memory.
+        groups is a tuple of the groups of numbers and tables
+        the corresponding read-only memoryviews.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.memory = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.rows, self.columns, count = struct.unpack_from('<4sHBBB', self.memory)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a pattern database")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, expected {VERSION}; rebuild it")
+        position = struct.calcsize('<4sHBBB')
+        view = memoryview(self.memory)
+        groups, tables = [], []
+        for g in range(count):
+            k = self.memory[position]
+            groups.append(tuple(self.memory[position + 1 : position + 1 + k]))
+            position += 1 + k
+            offset, length = struct.unpack_from('<QQ', self.memory, position)
+            position += struct.calcsize('<QQ')
+            tables.append(view[offset : offset + length])
+        self.groups = tuple(groups)
+        self.tables = tuple(tables)
+
+
+### Databases are opened once per process.
+_opened = {}
+
+
+def load(path):
+    path = os.path.abspath(path)
+    if path not in _opened:
+        _opened[path] = PatternDatabase(path)
+    return _opened[path]
+
+
+def find(rows, columns):
+    """ Return the database of the default file for the board size, or None if not built."""
+    path = defaultPath(rows, columns)
+    return load(path) if os.path.exists(path) else None
+
+
+
+
+class PatternDatabaseHeuristic:
+    """ The sum of the table values of the groups, for PuzzleSolver.IDAStar.
+        A move changes the placement of one group only, so move() looks up one table.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.cells = database.rows * database.columns
+        self.groupOf = [None] * (self.cells + 1)
+        for g, group in enumerate(database.groups):
+            for number in group:
+                self.groupOf[number] = g
+
+    def start(self, tiles):
+        self.where = [0] * (self.cells + 1)
+        for index, number in enumerate(tiles):
+            self.where[number] = index
+        self.values = [table[rank([self.where[number] for number in group], self.cells)]
+                       for group, table in zip(self.database.groups, self.database.tables)]
+        self.total = sum(self.values)
+        return self.total
+
+    def move(self, tiles, number, source, target):
+        self.where[number] = target
+        g = self.groupOf[number]
+        group = self.database.groups[g]
+        value = self.database.tables[g][rank([self.where[n] for n in group], self.cells)]
+        self.total += value - self.values[g]
+        self.values[g] = value
+        return self.total
+
+
+def parsePartition(text):
+    return tuple(tuple(int(number) for number in group.split(',')) for group in text.split())
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Build pattern databases for the sliding puzzle.")
+    parser.add_argument("rows", type = int)
+    parser.add_argument("columns", type = int)
+    parser.add_argument("--partition", type = parsePartition,
+                        help = 'groups separated by spaces, numbers by commas, e.g. "1,2,4,5 3,6,7,8"')
+    parser.add_argument("--output", help = "file to write (default: next to this module)")
+    args = parser.parse_args(arguments)
+    if args.partition is None and (args.rows, args.columns) not in DEFAULT_PARTITIONS:
+        parser.error("no default partition for this size; give --partition")
+    print(build(args.rows, args.columns, args.partition, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+'''Generate sliding puzzles of a given difficulty ahead of time.
+The difficulty of a board is the number of moves in a shortest solution.
+Boards with an exact distance table (see DistanceTables) are drawn uniformly
+from all boards in the requested band. Larger boards are produced by random
+walks from the solved board and measured with PuzzleSolver.IDAStar; the
+length of the walks adapts to the results. For boards too large to solve
+optimally, the admissible heuristic is used as the difficulty instead,
+and the file records that the values are estimates.
+
+    python PuzzleGenerator.py 4 4 40 --count 10000 --output boards.bin
+    python PuzzleGenerator.py 3 3 20 --high 25 --count 5000 --output easy.bin
+
+File layout (little-endian):
+    header:  magic b'SPGN', version (H), rows (B), columns (B), exact (B)
+    records: rows * columns bytes (the numbers of Boards.SlidingPuzzle.tiles)
+             followed by one byte of difficulty
+'''
+
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+from itertools import islice
+import DistanceTables
+from PuzzleSolver import IDAStar, ManhattanLinearConflict, adjacentIndices
+from PatternDatabases import find as findPatternDatabase
+
+
+MAGIC = b'SPGN'
+VERSION = 1
+HEADER = '<4sHBBB'
+### Boards up to this size are solved optimally even without pattern databases.
+OPTIMAL_CELLS = 16
+
+
+def isExact(rows, columns):
+    """ True if the difficulties of boards of this size are exact solution lengths."""
+    return rows * columns <= OPTIMAL_CELLS or findPatternDatabase(rows, columns) is not None
+
+
+def fromTable(rows, columns, low, high, generator):
+    """ Yield the boards with low <= distance <= high from the distance table
+        in a uniformly random order. The sequence ends when all have been yielded.
+    """
+    table = DistanceTables.forSize(rows, columns)
+    ranks = [rank for rank, value in enumerate(table.table) if low <= value <= high]
+    generator.shuffle(ranks)
+    size = rows * columns
+    for rank in ranks:
+        yield DistanceTables.lehmerUnrank(rank, size), table.table[rank]
+
+
+def fromWalks(rows, columns, low, high, generator, exact):
+    """ Yield boards with low <= difficulty <= high from random walks.
+        A walk never undoes its previous move. The walk is made longer when the
+        boards are too easy and shorter when they are too hard; the length
+        keeps the parity of the band, since every path between two boards
+        has the same parity.
+    """
+    size = rows * columns
+    adjacent = adjacentIndices(rows, columns)
+    if exact:
+        solver = IDAStar(rows, columns)
+        measure = lambda tiles: len(solver.solve(tiles))
+    else:
+        heuristic = ManhattanLinearConflict(rows, columns)
+        measure = heuristic.start
+    length = high + 10
+    while True:
+        tiles = bytearray(range(1, size + 1))
+        blank, previous = size - 1, -1
+        for step in range(length):
+            target = generator.choice([index for index in adjacent[blank] if index != previous])
+            tiles[blank], tiles[target] = tiles[target], size
+            previous, blank = blank, target
+        difficulty = measure(tiles)
+        if difficulty < low:
+            length += 2
+        elif difficulty > high:
+            length = max(length - 2, 2 - high % 2)
+        else:
+            yield tiles, difficulty
+
+
+def generate(rows, columns, low, high = None, seed = None, patience = 10000):
+    """ Yield distinct boards (bytearray, difficulty) with low <= difficulty <= high
+        (high defaults to low). For small boards the sequence ends after every board
+        of the band. Otherwise it ends when patience boards in a row have all been
+        seen before, as a narrow band may have only a few boards.
+    """
+    if high is None:
+        high = low
+    generator = random.Random(seed)
+    if rows * columns <= DistanceTables.MAX_CELLS:
+        boards = fromTable(rows, columns, low, high, generator)
+    else:
+        boards = fromWalks(rows, columns, low, high, generator, isExact(rows, columns))
+    seen = set()
+    repeats = 0
+    for tiles, difficulty in boards:
+        key = bytes(tiles)
+        if key not in seen:
+            seen.add(key)
+            repeats = 0
+            yield tiles, difficulty
+        else:
+            repeats += 1
+            if repeats >= patience:
+                return
+
+
+def writeBoards(path, rows, columns, boards, exact = True, batch = 1000):
+    """ Write the boards (pairs of tiles and difficulty) to a new file,
+        flushing every batch boards. Return the number of boards written.
+    """
+    count = 0
+    with open(path, 'wb') as file:
+        file.write(struct.pack(HEADER, MAGIC, VERSION, rows, columns, exact))
+        records = bytearray()
+        for tiles, difficulty in boards:
+            records += tiles
+            records.append(min(difficulty, 255))
+            count += 1
+            if count % batch == 0:
+                file.write(records)
+                file.flush()
+                records = bytearray()
+        file.write(records)
+    return count
+
+
+class BoardFile:
+    """ A file written by writeBoards, mapped to memory.
+        The boards are read one by one with indexing or iteration.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.memory = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.rows, self.columns, exact = struct.unpack_from(HEADER, self.memory)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a board file")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, expected {VERSION}")
+        self.exact = bool(exact)
+        self.start = struct.calcsize(HEADER)
+        self.recordSize = self.rows * self.columns + 1
+
+    def __len__(self):
+        return (len(self.memory) - self.start) // self.recordSize
+
+    def __getitem__(self, index):
+        """ Return the pair (tiles, difficulty) of board number index."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        begin = self.start + index * self.recordSize
+        end = begin + self.recordSize - 1
+        return self.memory[begin : end], self.memory[end]
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Generate sliding puzzles of a given difficulty.")
+    parser.add_argument("rows", type = int)
+    parser.add_argument("columns", type = int)
+    parser.add_argument("low", type = int, help = "smallest number of moves")
+    parser.add_argument("--high", type = int, help = "largest number of moves (default: low)")
+    parser.add_argument("--count", type = int, default = 1000)
+    parser.add_argument("--seed", type = int)
+    parser.add_argument("--batch", type = int, default = 1000, help = "boards written at a time")
+    parser.add_argument("--output", required = True)
+    args = parser.parse_args(arguments)
+
+    boards = generate(args.rows, args.columns, args.low, args.high, args.seed)
+    count = writeBoards(args.output, args.rows, args.columns, islice(boards, args.count),
+                        isExact(args.rows, args.columns), args.batch)
+    print(f"{count} boards written to {args.output}", file = sys.stderr)
+    if count < args.count:
+        print(f"Only {count} distinct boards were found in the band.", file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+'''An optimal solver for the sliding puzzle of Boards.SlidingPuzzle.
+The solver runs IDA* (iterative deepening A*) on a flat list of numbers,
+so it can be used without tkinter and without creating a SlidingPuzzle.
+The numbers are as in SlidingPuzzle: 1, ..., rows * columns, and the largest
+number is the blank piece. The heuristic is Manhattan distance with linear
+conflicts; both are updated incrementally after every move. If pattern
+databases have been built for the size of the board (see PatternDatabases),
+they are used instead.
+
+A solution is a list of cells (i, j). Each cell is the position of the piece
+that slides into the blank, so the moves can be given one by one
+to SlidingPuzzle.movePieces.
+'''
+
+
+import time
+from bisect import bisect_left
+
+
+def isSolvable(tiles, rows, columns):
+    """ Return True if the flat board tiles can be solved by sliding the pieces."""
+    size = rows * columns
+    ### The parity of the permutation has to agree with the parity of
+    ### the distance of the blank piece from its own position.
+    seen = [False] * size
+    cycles = 0
+    for index in range(size):
+        if not seen[index]:
+            cycles += 1
+            while not seen[index]:
+                seen[index] = True
+                index = tiles[index] - 1
+    blank = list(tiles).index(size)
+    distance = (rows - 1 - blank // columns) + (columns - 1 - blank % columns)
+    return (size - cycles) % 2 == distance % 2
+
+
+def adjacentIndices(rows, columns):
+    """ Return a tuple whose item k contains the flat indices next to the flat index k."""
+    adjacent = []
+    for index in range(rows * columns):
+        i, j = divmod(index, columns)
+        cells = []
+        if i > 0:
+            cells.append(index - columns)
+        if j > 0:
+            cells.append(index - 1)
+        if j < columns - 1:
+            cells.append(index + 1)
+        if i < rows - 1:
+            cells.append(index + columns)
+        adjacent.append(tuple(cells))
+    return tuple(adjacent)
+
+
+
+
+class ManhattanLinearConflict:
+    """ Manhattan distance plus linear conflicts.
+        start() computes the value for a whole board and move() updates it after
+        one piece has moved, so that only the row or the column lines crossed
+        by the piece are recomputed.
+    """
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        size = rows * columns
+        ### distance[n][k] is the Manhattan distance of the number n at the flat index k.
+        ### The blank piece (and the unused number 0) do not count.
+        self.distance = [[0] * size for n in range(size + 1)]
+        for number in range(1, size):
+            goalRow, goalCol = divmod(number - 1, columns)
+            for index in range(size):
+                i, j = divmod(index, columns)
+                self.distance[number][index] = abs(i - goalRow) + abs(j - goalCol)
+        ### Lines 0, ..., rows - 1 are the rows and the rest are the columns.
+        self.lines = [tuple(range(i * columns, (i + 1) * columns)) for i in range(rows)] + \
+                     [tuple(range(j, size, columns)) for j in range(columns)]
+
+    def lineConflict(self, tiles, line):
+        """ Return the number of extra moves needed by pieces in their goal line
+            but in the wrong order. The pieces not in a longest correctly
+            ordered subsequence have to leave the line and come back.
+        """
+        columns = self.columns
+        size = self.rows * columns
+        ordered = []
+        if line < self.rows:
+            for index in self.lines[line]:
+                number = tiles[index]
+                if number != size and (number - 1) // columns == line:
+                    ordered.append((number - 1) % columns)
+        else:
+            column = line - self.rows
+            for index in self.lines[line]:
+                number = tiles[index]
+                if number != size and (number - 1) % columns == column:
+                    ordered.append((number - 1) // columns)
+        if len(ordered) < 2:
+            return 0
+        ### Length of the longest increasing subsequence
+        longest = []
+        for goal in ordered:
+            k = bisect_left(longest, goal)
+            if k == len(longest):
+                longest.append(goal)
+            else:
+                longest[k] = goal
+        return 2 * (len(ordered) - len(longest))
+
+    def start(self, tiles):
+        self.manhattan = sum(self.distance[number][index] for index, number in enumerate(tiles))
+        self.conflicts = [self.lineConflict(tiles, line) for line in range(len(self.lines))]
+        self.conflictSum = sum(self.conflicts)
+        return self.manhattan + self.conflictSum
+
+    def move(self, tiles, number, source, target):
+        """ The piece number has moved from source to target (the board tiles is
+            already updated). Return the new value of the heuristic.
+        """
+        self.manhattan += self.distance[number][target] - self.distance[number][source]
+        columns = self.columns
+        ### A horizontal move changes only the two columns, a vertical move the two rows.
+        if source // columns == target // columns:
+            changed = (self.rows + source % columns, self.rows + target % columns)
+        else:
+            changed = (source // columns, target // columns)
+        for line in changed:
+            new = self.lineConflict(tiles, line)
+            self.conflictSum += new - self.conflicts[line]
+            self.conflicts[line] = new
+        return self.manhattan + self.conflictSum
+
+
+
+
+def defaultHeuristic(rows, columns):
+    """ Pattern databases if they have been built for the size, otherwise
+        Manhattan distance with linear conflicts.
+    """
+    from PatternDatabases import find, PatternDatabaseHeuristic
+    database = find(rows, columns)
+    if database is not None:
+        return PatternDatabaseHeuristic(database)
+    return ManhattanLinearConflict(rows, columns)
+
+
+
+
+class Solution:
+    """ moves is a list of cells (i, j) to click, nodes is the number of
+        expanded nodes, and seconds is the time used by the search.
+    """
+    def __init__(self, moves, nodes, seconds):
+        self.moves = moves
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __repr__(self):
+        return f"Solution({len(self.moves)} moves, {self.nodes} nodes, {self.seconds:.3f} s)"
+
+
+
+
+class IDAStar:
+    """ Iterative deepening A* for boards of the given size.
+        The heuristic is any object with the methods start and move
+        of ManhattanLinearConflict; it has to be admissible.
+    """
+    def __init__(self, rows, columns, heuristic = None):
+        self.rows = rows
+        self.columns = columns
+        self.heuristic = heuristic if heuristic is not None else defaultHeuristic(rows, columns)
+        self.adjacent = adjacentIndices(rows, columns)
+        self.goal = list(range(1, rows * columns + 1))
+
+    def solve(self, tiles):
+        """ Return an optimal Solution for the flat board tiles.
+            Raise ValueError if the board cannot be solved.
+        """
+        if not isSolvable(tiles, self.rows, self.columns):
+            raise ValueError("The board cannot be solved")
+        begin = time.perf_counter()
+        self.tiles = list(tiles)
+        self.path = []
+        self.nodes = 0
+        blank = self.tiles.index(len(self.tiles))
+        h = self.heuristic.start(self.tiles)
+        bound = h
+        while True:
+            result = self.search(blank, 0, h, bound, -1)
+            if result < 0:
+                break
+            bound = result
+        moves = [divmod(index, self.columns) for index in self.path]
+        return Solution(moves, self.nodes, time.perf_counter() - begin)
+
+    def search(self, blank, g, h, bound, previous):
+        """ Depth-first search below the bound. Return -1 when the goal is found
+            (self.path then holds the moves), otherwise the smallest f
+            that exceeded the bound.
+        """
+        f = g + h
+        if f > bound:
+            return f
+        tiles = self.tiles
+        if h == 0 and tiles == self.goal:
+            return -1
+        self.nodes += 1
+        blankNumber = len(tiles)
+        heuristic = self.heuristic
+        minimum = float('inf')
+        for target in self.adjacent[blank]:
+            ### Never undo the previous move.
+            if target == previous:
+                continue
+            number = tiles[target]
+            tiles[blank], tiles[target] = number, blankNumber
+            self.path.append(target)
+            result = self.search(target, g + 1, heuristic.move(tiles, number, target, blank),
+                                 bound, blank)
+            if result < 0:
+                return result
+            self.path.pop()
+            tiles[blank], tiles[target] = blankNumber, number
+            heuristic.move(tiles, number, blank, target)
+            if result < minimum:
+                minimum = result
+        return minimum
+
+
+def solve(puzzle, heuristic = None):
+    """ Return an optimal Solution for a SlidingPuzzle.
+        Small boards with a built distance table (see DistanceTables) are solved
+        by following the table, without a search.
+    """
+    from DistanceTables import find
+    table = find(puzzle.rows, puzzle.columns) if heuristic is None else None
+    if table is None:
+        return IDAStar(puzzle.rows, puzzle.columns, heuristic).solve(puzzle.tiles)
+    begin = time.perf_counter()
+    if table.distance(puzzle.tiles) is None:
+        raise ValueError("The board cannot be solved")
+    tiles = list(puzzle.tiles)
+    blank = tiles.index(len(tiles))
+    moves = []
+    while True:
+        target = table.nextMove(tiles)
+        if target is None:
+            break
+        tiles[blank], tiles[target] = tiles[target], len(tiles)
+        blank = target
+        moves.append(divmod(target, puzzle.columns))
+    return Solution(moves, len(moves), time.perf_counter() - begin)
+
+
+def nextMove(puzzle):
+    """ Return the cell of the piece to move next on an optimal path,
+        or None if the puzzle is solved. Raise ValueError if it cannot be solved.
+    """
+    if puzzle.isSolved():
+        return None
+    from DistanceTables import find
+    table = find(puzzle.rows, puzzle.columns)
+    if table is not None:
+        target = table.nextMove(puzzle.tiles)
+        if target is None:
+            raise ValueError("The board cannot be solved")
+        return divmod(target, puzzle.columns)
+    return solve(puzzle).moves[0]
@@ -0,0 +1,315 @@
+'''Arrays of quaternions (requires numpy).
+A QuaternionArray holds N quaternions in an (N, 4) float64 array, the columns being
+the real part and the coefficients of i, j, and k as in Quaternions.Quaternion.
+The operations +, -, *, and / work on all the quaternions at once and have the same
+meaning as for Quaternion: * is the Hamilton product (or the product with a real number),
+and p / q is p * q.inverse(). An operand may be a QuaternionArray, a single Quaternion,
+a real number, or (for * and /) a numpy column of N real numbers, of shape (N, 1)
+(a one-dimensional array of four numbers is a quaternion); the usual numpy
+broadcasting applies, so an array of one quaternion combines with an array of N.
+Indexing with an integer gives a Quaternion, anything else a QuaternionArray.
+The array exposes its memory through the buffer protocol (memoryview(qa) needs
+Python 3.12; np.asarray(qa) works everywhere), and bytes(qa) and frombuffer use
+the records of Quaternions.RECORD.'''
+
+import numbers
+import numpy as np
+from Quaternions import Quaternion
+
+
+def hamilton(p, q):
+    """ The Hamilton products of two float arrays of quaternions of shape (..., 4)."""
+    a, b, c, d = np.moveaxis(p, -1, 0)
+    e, f, g, h = np.moveaxis(q, -1, 0)
+    return np.stack((a * e - b * f - c * g - d * h,
+                     a * f + b * e + c * h - d * g,
+                     a * g - b * h + c * e + d * f,
+                     a * h + b * g - c * f + d * e), axis = -1)
+
+
+class QuaternionArray:
+    # numpy arrays leave the operations with a QuaternionArray to it.
+    __array_ufunc__ = None
+
+    # components is an (N, 4) array, a sequence of Quaternions, or a sequence of
+    # sequences of four numbers. The array is copied.
+    def __init__(self, components):
+        self.array = np.array(components, dtype = np.float64).reshape(-1, 4)
+
+    # Wrap an array of shape (..., 4) without copying it.
+    @classmethod
+    def _new(cls, array):
+        qa = object.__new__(cls)
+        qa.array = array
+        return qa
+
+    # The quaternions in data (bytes, mmap, ...) packed as in Quaternions.RECORD,
+    # without copying them; the array is read-only if data is.
+    @classmethod
+    def frombuffer(cls, data):
+        return cls._new(np.frombuffer(data, dtype = '<f8').reshape(-1, 4))
+
+    @classmethod
+    def zeros(cls, n):
+        return cls._new(np.zeros((n, 4)))
+
+    @classmethod
+    def ones(cls, n):
+        # n times the quaternion 1+0i+0j+0k
+        array = np.zeros((n, 4))
+        array[:, 0] = 1
+        return cls._new(array)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, numbers.Integral):
+            return Quaternion._new(*self.array[index].tolist())
+        return QuaternionArray._new(self.array[index])
+
+    def __setitem__(self, index, value):
+        self.array[index] = components(value)
+
+    def __iter__(self):
+        for w, x, y, z in self.array.tolist():
+            yield Quaternion._new(w, x, y, z)
+
+    def __array__(self, dtype = None, copy = None):
+        return self.array if dtype is None else self.array.astype(dtype)
+
+    def __buffer__(self, flags):
+        return memoryview(self.array)
+
+    def __bytes__(self):
+        return self.array.astype('<f8', copy = False).tobytes()
+
+    def __str__(self):
+        return '[' + ', '.join(str(q) for q in self) + ']'
+
+    def __repr__(self):
+        return f"QuaternionArray({self.array.tolist()})"
+
+    def __abs__(self):
+        return np.sqrt(np.einsum('...i,...i->...', self.array, self.array))
+
+    def __neg__(self):
+        return QuaternionArray._new(-self.array)
+
+    def __add__(self, other):
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(self.array + other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __sub__(self, other):
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(self.array - other)
+
+    def __rsub__(self, other):
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(other - self.array)
+
+    def __mul__(self, other):
+        scale = scalars(other)
+        if scale is not None:
+            return QuaternionArray._new(self.array * scale)
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(hamilton(self.array, other))
+
+    # The product is not commutative: q * qa multiplies by q from the left.
+    def __rmul__(self, other):
+        scale = scalars(other)
+        if scale is not None:
+            return QuaternionArray._new(scale * self.array)
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(hamilton(other, self.array))
+
+    def __truediv__(self, other):
+        scale = scalars(other)
+        if scale is not None:
+            return QuaternionArray._new(self.array / scale)
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(hamilton(self.array, inverse(other)))
+
+    def __rtruediv__(self, other):
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        return QuaternionArray._new(hamilton(other, inverse(self.array)))
+
+    # qa ** n for a real number n, with the same rules as Quaternion.__pow__.
+    def __pow__(self, n):
+        if isinstance(n, numbers.Integral):
+            base = self.array if n >= 0 else inverse(self.array)
+            n = abs(n)
+            result = np.zeros_like(base)
+            result[..., 0] = 1
+            while n:
+                if n & 1:
+                    result = hamilton(result, base)
+                n >>= 1
+                if n:
+                    base = hamilton(base, base)
+            return QuaternionArray._new(result)
+        if isinstance(n, numbers.Real):
+            zero = ~self.array.any(axis = -1)
+            if n > 0 and zero.any():
+                ### 0 ** n = 0; the other quaternions as usual.
+                safe = np.where(zero[..., None], [1.0, 0.0, 0.0, 0.0], self.array)
+                result = exp(log(safe) * n)
+                result[zero] = 0
+                return QuaternionArray._new(result)
+            return QuaternionArray._new(exp(log(self.array) * n))
+        return NotImplemented
+
+    # The in-place operations write into the array itself.
+    def __iadd__(self, other):
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        self.array += other
+        return self
+
+    def __imul__(self, other):
+        scale = scalars(other)
+        if scale is not None:
+            self.array *= scale
+            return self
+        other = components(other)
+        if other is None:
+            return NotImplemented
+        self.array[...] = hamilton(self.array, other)
+        return self
+
+    def fma(self, other, addend):
+        """ self * other + addend as one operation."""
+        addend = components(addend)
+        scale = scalars(other)
+        if scale is not None:
+            product = self.array * scale
+        else:
+            product = hamilton(self.array, components(other))
+        product += addend
+        return QuaternionArray._new(product)
+
+    def conjugate(self):
+        return QuaternionArray._new(self.array * [1, -1, -1, -1])
+
+    def inverse(self):
+        return QuaternionArray._new(inverse(self.array))
+
+    def normalized(self):
+        """ The quaternions divided by their absolute values."""
+        return QuaternionArray._new(self.array / abs(self)[..., None])
+
+    def exp(self):
+        return QuaternionArray._new(exp(self.array))
+
+    def log(self):
+        return QuaternionArray._new(log(self.array))
+
+    def sqrt(self):
+        return QuaternionArray._new(sqrt(self.array))
+
+
+def inverse(array):
+    norms = np.einsum('...i,...i->...', array, array)
+    if np.any(norms == 0):
+        raise ZeroDivisionError("a zero quaternion has no inverse")
+    return array * [1, -1, -1, -1] / norms[..., None]
+
+
+def exp(array):
+    """ The exponential functions of an array of quaternions (see Quaternion.exp)."""
+    length = np.linalg.norm(array[..., 1:], axis = -1)
+    scale = np.exp(array[..., 0])
+    factor = scale * np.sinc(length / np.pi)
+    return np.concatenate(((scale * np.cos(length))[..., None], factor[..., None] * array[..., 1:]), axis = -1)
+
+
+def log(array):
+    """ The principal logarithms of an array of quaternions (see Quaternion.log)."""
+    length = np.linalg.norm(array[..., 1:], axis = -1)
+    norm = np.linalg.norm(array, axis = -1)
+    if np.any(norm == 0):
+        raise ValueError("math domain error")
+    angle = np.arctan2(length, array[..., 0])
+    real = length == 0
+    factor = angle / np.where(real, 1, length)
+    result = np.concatenate((np.log(norm)[..., None], factor[..., None] * array[..., 1:]), axis = -1)
+    ### Negative real numbers: the vector part is pi i.
+    result[..., 1] = np.where(real, angle, result[..., 1])
+    return result
+
+
+def norms(array):
+    """ The lengths of the vectors along the last axis, scaled so that tiny
+        components do not underflow when squared.
+    """
+    largest = np.max(np.abs(array), axis = -1)
+    scale = np.where(largest > 0, largest, 1)[..., None]
+    return largest * np.sqrt(np.sum((array / scale) ** 2, axis = -1))
+
+
+def sqrt(array):
+    """ The principal square roots of an array of quaternions (see Quaternion.sqrt)."""
+    w, vector = array[..., 0], array[..., 1:]
+    norm = norms(array)
+    length = norms(vector)
+    positive = w >= 0
+    ### w >= 0: the real part from (|q| + w) / 2; w < 0: the length b of the vector
+    ### part from (|q| - w) / 2, which does not cancel.
+    real = np.sqrt((norm + np.where(positive, w, 0)) / 2)
+    b = np.sqrt((norm - np.where(positive, 0, w)) / 2)
+    safeB = np.where(b > 0, b, 1)
+    real = np.where(positive, real, length / (2 * safeB))
+    factor = np.where(positive, 0.5 / np.where(real > 0, real, 1), b / np.where(length > 0, length, 1))
+    result = np.concatenate((real[..., None], factor[..., None] * vector), axis = -1)
+    ### Negative real numbers: the square root is sqrt(-w) i = b i.
+    negative = ~positive & (length == 0)
+    result[..., 1] = np.where(negative, b, result[..., 1])
+    return result
+
+
+def components(value):
+    """ The quaternions of value as a float array of shape (..., 4), or None
+        if value is not a QuaternionArray, a Quaternion or a sequence of them.
+    """
+    if isinstance(value, QuaternionArray):
+        return value.array
+    if isinstance(value, Quaternion):
+        return np.array((value.w, value.x, value.y, value.z))
+    if isinstance(value, numbers.Number):
+        return None
+    try:
+        array = np.asarray(value, dtype = np.float64)
+    except (TypeError, ValueError):
+        return None
+    return array if array.ndim and array.shape[-1] == 4 else None
+
+
+def scalars(value):
+    """ value as a real number or a column of N reals (shape (N, 1)), or None if it is not one.
+        A one-dimensional array is not taken for N reals, as with N = 4 it would
+        be mistaken for a quaternion.
+    """
+    if isinstance(value, numbers.Real):
+        return value
+    if isinstance(value, np.ndarray) and value.ndim >= 2 and value.shape[-1] == 1 \
+       and value.dtype.kind in 'biuf':
+        return value
+    return None
@@ -0,0 +1,170 @@
+'''Files of quaternions (requires numpy).
+A quaternion file starts with an 8-byte header: the magic b'QUAT', the version,
+and two bytes of padding. Then come the quaternions as records of four little-endian
+float64 (w, x, y, z; see Quaternions.RECORD), so the number of quaternions is given
+by the size of the file and more can be appended at any time.
+QuaternionWriter writes a file in chunks; QuaternionFile maps a file into memory,
+so its quaternions are read as needed and chunks of them are numpy arrays
+without an object for every quaternion.
+parseQuaternions reads many quaternions written as by Quaternion.__str__
+(such as 1.0+2.0i-3.0j+4.0k) at once, and readText does the same for a text file
+chunk by chunk.
+
+    python QuaternionFiles.py quaternions.txt quaternions.bin
+'''
+
+import argparse
+import struct
+import sys
+import numpy as np
+from Quaternions import Quaternion, RECORD
+from QuaternionArrays import QuaternionArray, components
+
+
+MAGIC = b'QUAT'
+VERSION = 1
+HEADER = struct.Struct('<4sHxx')
+SEPARATORS = str.maketrans('ijk,', '    ')
+### Everything but the labels i, j, k in a valid text (inf written as INF).
+NOT_LABELS = b'0123456789.+-eEnaINF ,\t\r\n'
+
+
+class QuaternionWriter:
+    """ Writes quaternions to a file at path, appending to an existing file
+        if append is True. Use the writer in a with statement or call close.
+    """
+    def __init__(self, path, append = False):
+        self.file = open(path, 'ab' if append else 'wb')
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.count = 0
+
+    def write(self, quaternions):
+        """ Write a Quaternion, a QuaternionArray, or an array of shape (N, 4)."""
+        if isinstance(quaternions, Quaternion):
+            self.file.write(bytes(quaternions))
+            self.count += 1
+            return
+        array = components(quaternions)
+        if array is None:
+            raise TypeError("expected quaternions")
+        array = array.reshape(-1, 4)
+        self.file.write(array.astype('<f8', copy = False).tobytes())
+        self.count += len(array)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def save(path, quaternions):
+    with QuaternionWriter(path) as writer:
+        writer.write(quaternions)
+
+
+class QuaternionFile:
+    """ A quaternion file mapped into memory (read-only unless writable is True).
+        len gives the number of quaternions; indexing works as for QuaternionArray,
+        but the arrays share the memory of the file.
+    """
+    def __init__(self, path, writable = False):
+        with open(path, 'rb') as file:
+            magic, version = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a quaternion file of version {VERSION}")
+            size = file.seek(0, 2)
+        count = (size - HEADER.size) // RECORD.size
+        if count:
+            self.array = np.memmap(path, dtype = '<f8', mode = 'r+' if writable else 'r',
+                                   offset = HEADER.size, shape = (count, 4))
+        else:
+            ### An empty file cannot be mapped.
+            self.array = np.zeros((0, 4))
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        return QuaternionArray._new(self.array)[index]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self, size = 1 << 16):
+        """ Yield the quaternions as QuaternionArrays of size quaternions (the last may
+            be shorter). They are views of the mapped file; nothing is copied.
+        """
+        for start in range(0, len(self.array), size):
+            yield QuaternionArray._new(self.array[start : start + size])
+
+    def close(self):
+        ### Closing the map is left to numpy: arrays taken from the file may still use it.
+        self.array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def parseQuaternions(text):
+    """ Return a QuaternionArray of all the quaternions in text, written as
+        by Quaternion.__str__ and separated by whitespace or commas.
+        The text is split into numbers with string methods, not one regular
+        expression match per quaternion (see Quaternions.parse).
+    """
+    ### Put a space before every sign that does not belong to an exponent and before
+    ### nan (written without a sign by addPlus), and turn i, j, k, and commas into
+    ### spaces (inf would lose its i).
+    text = text.replace('inf', 'INF').replace('nan', ' nan').replace('+', ' +').replace('-', ' -')
+    text = text.replace('e +', 'e+').replace('e -', 'e-').replace('+ nan', '+nan').replace('- nan', '-nan')
+    ### The labels have to come in the order i, j, k, once for every four numbers.
+    labels = text.encode('ascii', 'replace').translate(None, NOT_LABELS)
+    text = text.translate(SEPARATORS)
+    values = np.array(text.split(), dtype = np.float64)
+    if len(values) != 4 * len(labels) // 3 or labels != b'ijk' * (len(labels) // 3):
+        raise ValueError("the text does not consist of quaternions")
+    return QuaternionArray._new(values.reshape(-1, 4))
+
+
+def readText(path, chunkSize = 1 << 24):
+    """ Yield QuaternionArrays of the quaternions of a text file, reading about
+        chunkSize characters at a time. A chunk is cut at whitespace, so the
+        quaternions must be separated by whitespace.
+    """
+    with open(path) as file:
+        rest = ''
+        while True:
+            text = file.read(chunkSize)
+            if not text:
+                break
+            text = rest + text
+            cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t')) + 1
+            text, rest = text[:cut], text[cut:]
+            if text:
+                yield parseQuaternions(text)
+        if rest:
+            yield parseQuaternions(rest)
+
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Convert quaternions from text to a quaternion file.")
+    parser.add_argument("text")
+    parser.add_argument("output")
+    args = parser.parse_args(arguments)
+
+    with QuaternionWriter(args.output) as writer:
+        for chunk in readText(args.text):
+            writer.write(chunk)
+    print(f"{writer.count} quaternions written to {args.output}", file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
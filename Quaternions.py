@@ -1,25 +1,79 @@
 '''The class of quaternions is defined.
 The operations +, -, *, and / between quaternions are defined using operator overloading.
 The class also contains a string representation of quaternions (as in 1+2i-3j+4k),
-and methods to find the conjugate and the inverse of a quaternion.'''
+and methods to find the conjugate and the inverse of a quaternion, the exponential
+function, the logarithm, the square root, and powers.
+A quaternion packs into 32 bytes (four little-endian float64, see RECORD; also
+through the buffer protocol from Python 3.12), and parse reads the string
+representation back.'''
 
+import math
 import numbers
+import re
+import struct
+import sys
+from array import array
+
+# The binary form of a quaternion: w, x, y, z as little-endian float64.
+RECORD = struct.Struct('<4d')
+
+# A number as written by str(float), and a quaternion as written by Quaternion.__str__.
+NUMBER = r'[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|inf|nan)'
+PATTERN = re.compile(f'({NUMBER})({NUMBER})i({NUMBER})j({NUMBER})k')
 
 class Quaternion:
-    # components is a sequence of 
+    # components is a sequence of four numbers (or strings of numbers): the real part
+    # and the coefficients of i, j, and k. They are stored as floats in the slots w, x, y, z.
+    __slots__ = ('w', 'x', 'y', 'z')
+
     def __init__(self, components):
-        self.comps = [float(comp) for comp in components]
+        self.w, self.x, self.y, self.z = [float(comp) for comp in components]
+
+    # The operations create their results with _new, which takes four floats
+    # and skips the conversion done by __init__.
+    @classmethod
+    def _new(cls, w, x, y, z):
+        q = object.__new__(cls)
+        q.w = w
+        q.x = x
+        q.y = y
+        q.z = z
+        return q
+
+    # The components as a tuple: they are stored in the slots, so a list
+    # would take writes that never reach the quaternion.
+    @property
+    def comps(self):
+        return (self.w, self.x, self.y, self.z)
 
     def __getitem__(self, index):
-        return self.comps[index]
-    
+        return (self.w, self.x, self.y, self.z)[index]
+
+    def __iter__(self):
+        return iter((self.w, self.x, self.y, self.z))
+
+    def __len__(self):
+        return 4
+
+    def __bytes__(self):
+        return RECORD.pack(self.w, self.x, self.y, self.z)
+
+    # The buffer protocol (Python 3.12) gives a read-only copy of the record:
+    # the components are separate floats, not one block of memory.
+    def __buffer__(self, flags):
+        return memoryview(bytes(self))
+
+    @classmethod
+    def frombytes(cls, data, offset = 0):
+        return cls._new(*RECORD.unpack_from(data, offset))
+
     # addPlus() takes care of the signs; for example, get 1+2i-3j-4k instead of 1+2i+-3j+-4k
     def __str__(self):
-        return str(self[0]) + addPlus(self[1]) + 'i' \
-                            + addPlus(self[2]) + 'j' + addPlus(self[3]) + 'k'
-            
+        return str(self.w) + addPlus(self.x) + 'i' \
+                           + addPlus(self.y) + 'j' + addPlus(self.z) + 'k'
+
     def __abs__(self):
-        return (sum([comp ** 2 for comp in self])) ** 0.5
+        return math.sqrt(self.w * self.w + self.x * self.x + self.y * self.y + self.z * self.z)
 
     def __format__(self, fmt = ''):
         components = [format(c, fmt) for c in self]
@@ -27,46 +81,186 @@ class Quaternion:
         return str(q)
 
     def __bool__(self):
-        return abs(self)
+        return bool(self.w or self.x or self.y or self.z)
 
     def __neg__(self):
-        return Quaternion([-comp for comp in self])
-    
+        return Quaternion._new(-self.w, -self.x, -self.y, -self.z)
+
+    # The other operand may also be any sequence of four numbers. For other operands
+    # (such as a QuaternionArray) the operations return NotImplemented, so Python
+    # tries the reflected operation of the other operand.
     def __add__(self, other):
-        return Quaternion([a + b for a, b in zip(self, other)])
+        if type(other) is not Quaternion:
+            other = asQuaternion(other)
+            if other is None:
+                return NotImplemented
+        return Quaternion._new(self.w + other.w, self.x + other.x, self.y + other.y, self.z + other.z)
 
     def __sub__(self, other):
-        return self + (-other)
+        if type(other) is not Quaternion:
+            other = asQuaternion(other)
+            if other is None:
+                return NotImplemented
+        return Quaternion._new(self.w - other.w, self.x - other.x, self.y - other.y, self.z - other.z)
 
     def __mul__(self, other):
         # Check first if the second quaternion is a number. This defines scalar product.
         # A scalar r can be seen as a quaternion r + 0i + 0j + 0k, so one could
         # define the scalar product using quaternion product with Quaternion(r,0,0,0).
-        if isinstance(other, numbers.Real):
-            return Quaternion([other * comp for comp in self])
-        else:
-            rcomp = self[0] * other[0] - self[1] * other[1] - \
-                    self[2] * other[2] - self[3] * other[3]
-            icomp = self[0] * other[1] + self[1] * other[0] + \
-                    self[2] * other[3] - self[1] * other[2]
-            jcomp = self[0] * other[2] - self[1] * other[3] + \
-                    self[2] * other[0] + self[3] * other[1]
-            kcomp = self[0] * other[3] + self[1] * other[2] - \
-                    self[2] * other[1] + self[3] * other[0]
-            return Quaternion([rcomp, icomp, jcomp, kcomp])
+        if type(other) is not Quaternion:
+            if isinstance(other, numbers.Real):
+                return Quaternion._new(other * self.w, other * self.x, other * self.y, other * self.z)
+            other = asQuaternion(other)
+            if other is None:
+                return NotImplemented
+        a, b, c, d = self.w, self.x, self.y, self.z
+        e, f, g, h = other.w, other.x, other.y, other.z
+        return Quaternion._new(a * e - b * f - c * g - d * h,
+                               a * f + b * e + c * h - d * g,
+                               a * g - b * h + c * e + d * f,
+                               a * h + b * g - c * f + d * e)
 
     # To allow scalar multiplication also from the left
     def __rmul__(self, other):
         return self * other
 
     def __truediv__(self, other):
+        if isinstance(other, numbers.Real):
+            return self * (1 / other)
         return self * other.inverse()
 
+    # q ** n: an integer n is computed by repeated squaring (with the inverse of q
+    # for a negative n), any other real n as exp(n * log(q)).
+    def __pow__(self, n):
+        if isinstance(n, numbers.Integral):
+            base = self if n >= 0 else self.inverse()
+            n = abs(n)
+            result = Quaternion._new(1.0, 0.0, 0.0, 0.0)
+            while n:
+                if n & 1:
+                    result = result * base
+                n >>= 1
+                if n:
+                    base = base * base
+            return result
+        if isinstance(n, numbers.Real):
+            if not self and n > 0:
+                return Quaternion._new(0.0, 0.0, 0.0, 0.0)
+            return (self.log() * n).exp()
+        return NotImplemented
+
+    # The in-place operations change the quaternion itself, so every name
+    # referring to it sees the new value.
+    def __iadd__(self, other):
+        if type(other) is not Quaternion:
+            other = asQuaternion(other)
+            if other is None:
+                return NotImplemented
+        self.w += other.w
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __imul__(self, other):
+        if type(other) is not Quaternion and not isinstance(other, numbers.Real):
+            other = asQuaternion(other)
+            if other is None:
+                return NotImplemented
+        product = self * other
+        self.w, self.x, self.y, self.z = product.w, product.x, product.y, product.z
+        return self
+
+    # self * other + addend as one operation, without the intermediate product
+    def fma(self, other, addend):
+        if type(addend) is not Quaternion:
+            addend = Quaternion(addend)
+        if isinstance(other, numbers.Real):
+            return Quaternion._new(self.w * other + addend.w, self.x * other + addend.x,
+                                   self.y * other + addend.y, self.z * other + addend.z)
+        if type(other) is not Quaternion:
+            other = Quaternion(other)
+        a, b, c, d = self.w, self.x, self.y, self.z
+        e, f, g, h = other.w, other.x, other.y, other.z
+        return Quaternion._new(a * e - b * f - c * g - d * h + addend.w,
+                               a * f + b * e + c * h - d * g + addend.x,
+                               a * g - b * h + c * e + d * f + addend.y,
+                               a * h + b * g - c * f + d * e + addend.z)
+
     def conjugate(self):
-        return Quaternion([self[0], -self[1], -self[2], -self[3]])
+        return Quaternion._new(self.w, -self.x, -self.y, -self.z)
 
     def inverse(self):
-        return self.conjugate() * (1/(abs(self) ** 2))
+        r = 1 / (self.w * self.w + self.x * self.x + self.y * self.y + self.z * self.z)
+        return Quaternion._new(r * self.w, -r * self.x, -r * self.y, -r * self.z)
+
+    # exp(w + v) = exp(w) (cos|v| + v/|v| sin|v|), where v is the vector part.
+    def exp(self):
+        length = math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        scale = math.exp(self.w)
+        factor = scale * math.sin(length) / length if length else scale
+        return Quaternion._new(scale * math.cos(length),
+                               factor * self.x, factor * self.y, factor * self.z)
+
+    # The principal logarithm: log|q| + v/|v| arccos(w/|q|). For a negative real
+    # number the vector part is pi i. The zero quaternion has no logarithm (ValueError).
+    def log(self):
+        length = math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        norm = abs(self)
+        if not norm:
+            raise ValueError("math domain error")
+        if not length:
+            return Quaternion._new(math.log(norm), math.pi if self.w < 0 else 0.0, 0.0, 0.0)
+        factor = math.atan2(length, self.w) / length
+        return Quaternion._new(math.log(norm), factor * self.x, factor * self.y, factor * self.z)
+
+    # The principal square root, the one with a nonnegative real part. For w < 0,
+    # (|q| + w) / 2 would cancel, so the length b of the vector part of the root is
+    # computed first from (|q| - w) / 2. hypot does not underflow for tiny components.
+    def sqrt(self):
+        norm = math.hypot(self.w, self.x, self.y, self.z)
+        if self.w >= 0:
+            real = math.sqrt((norm + self.w) / 2)
+            factor = 1 / (2 * real) if real else 0.0
+            return Quaternion._new(real, factor * self.x, factor * self.y, factor * self.z)
+        length = math.hypot(self.x, self.y, self.z)
+        b = math.sqrt((norm - self.w) / 2)
+        if not length:
+            return Quaternion._new(0.0, b, 0.0, 0.0)
+        factor = b / length
+        return Quaternion._new(length / (2 * b), factor * self.x, factor * self.y, factor * self.z)
+
+
+def asQuaternion(value):
+    try:
+        return Quaternion(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Read a quaternion from its string representation, such as 1.0+2.0i-3.0j+4.0k.
+def parse(text):
+    match = PATTERN.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"not a quaternion: {text!r}")
+    return Quaternion(match.groups())
+
+
+# Pack quaternions into bytes of consecutive records, and back.
+def pack(quaternions):
+    values = array('d')
+    for q in quaternions:
+        values.extend((q.w, q.x, q.y, q.z))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack(data):
+    values = array('d', bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return [Quaternion._new(*values[k : k + 4]) for k in range(0, len(values), 4)]
 
 
 def addPlus(number):
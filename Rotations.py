@@ -0,0 +1,158 @@
+'''Rotations of three-dimensional space with quaternions (requires numpy).
+The unit quaternion cos(a/2) + sin(a/2)(ui + vj + wk) is the rotation by the angle a
+(in radians, counterclockwise) about the axis (u, v, w); a point p is rotated to
+q * p * q.inverse(), where p is seen as the quaternion 0 + xi + yj + zk.
+The functions take a Quaternion or a QuaternionArray (or an array of shape (N, 4))
+and handle whole batches with numpy; a single Quaternion gives a Quaternion
+(or a single matrix, axis, ...) back. Quaternions that are not unit quaternions
+are normalised first, as q * p * q.inverse() does not depend on the length of q.
+Points are rotated with the rotation matrix or with the cross product form of
+q * p * q.inverse(), without creating quaternions for the points.'''
+
+import numpy as np
+from Quaternions import Quaternion
+from QuaternionArrays import QuaternionArray, components, hamilton
+
+
+def wrap(array):
+    """ A Quaternion for one quaternion, a QuaternionArray for several."""
+    if array.ndim == 1:
+        return Quaternion._new(*array.tolist())
+    return QuaternionArray._new(array)
+
+
+def unit(q):
+    q = components(q)
+    if q is None:
+        raise TypeError("expected quaternions")
+    return q / np.linalg.norm(q, axis = -1, keepdims = True)
+
+
+def fromAxisAngle(axis, angle):
+    """ The rotations by angle about axis; axis has shape (3,) or (N, 3), angle
+        is a number or has shape (N,). The axes need not be unit vectors.
+    """
+    axis = np.asarray(axis, dtype = np.float64)
+    angle = np.asarray(angle, dtype = np.float64)
+    axis = axis / np.linalg.norm(axis, axis = -1, keepdims = True)
+    half = angle[..., None] / 2
+    return wrap(np.concatenate((np.cos(half), np.sin(half) * axis), axis = -1))
+
+
+def toAxisAngle(q):
+    """ The unit axes and the angles (in [0, 2 pi]) of the rotations q.
+        The axis of a rotation by 0 is (1, 0, 0).
+    """
+    q = unit(q)
+    sine = np.linalg.norm(q[..., 1:], axis = -1)
+    angle = 2 * np.arctan2(sine, q[..., 0])
+    safe = np.where(sine > 0, sine, 1)[..., None]
+    axis = np.where(sine[..., None] > 0, q[..., 1:] / safe, [1.0, 0.0, 0.0])
+    return axis, angle
+
+
+def toMatrix(q):
+    """ The rotation matrices of q, of shape (3, 3) or (N, 3, 3)."""
+    w, x, y, z = np.moveaxis(unit(q), -1, 0)
+    return np.stack((np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis = -1),
+                     np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis = -1),
+                     np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis = -1)),
+                    axis = -2)
+
+
+def fromMatrix(matrix):
+    """ The unit quaternions (with a nonnegative real part) of the rotation matrices
+        of shape (3, 3) or (N, 3, 3). Each is computed from the largest of
+        |w|, |x|, |y|, |z|, which avoids dividing by a small number.
+    """
+    m = np.asarray(matrix, dtype = np.float64)
+    trace = m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]
+    ### 4 w^2, 4 x^2, 4 y^2, 4 z^2 and the sums and differences of the other pairs.
+    squares = np.stack((1 + trace,
+                        1 + 2 * m[..., 0, 0] - trace,
+                        1 + 2 * m[..., 1, 1] - trace,
+                        1 + 2 * m[..., 2, 2] - trace), axis = -1)
+    wx = m[..., 2, 1] - m[..., 1, 2]
+    wy = m[..., 0, 2] - m[..., 2, 0]
+    wz = m[..., 1, 0] - m[..., 0, 1]
+    xy = m[..., 0, 1] + m[..., 1, 0]
+    xz = m[..., 0, 2] + m[..., 2, 0]
+    yz = m[..., 1, 2] + m[..., 2, 1]
+    ### Row k holds 4 times the largest component (k) times every component.
+    products = np.stack((np.stack((squares[..., 0], wx, wy, wz), axis = -1),
+                         np.stack((wx, squares[..., 1], xy, xz), axis = -1),
+                         np.stack((wy, xy, squares[..., 2], yz), axis = -1),
+                         np.stack((wz, xz, yz, squares[..., 3]), axis = -1)), axis = -2)
+    largest = np.argmax(squares, axis = -1)
+    row = np.take_along_axis(products, largest[..., None, None], axis = -2)[..., 0, :]
+    q = row / np.linalg.norm(row, axis = -1, keepdims = True)
+    return wrap(np.where(q[..., :1] < 0, -q, q))
+
+
+def rotate(q, points):
+    """ Rotate points (shape (3,) or (M, 3)) by q. With one rotation, every point
+        is rotated by it; with N rotations, there must be one point or N points.
+    """
+    q = unit(q)
+    points = np.asarray(points, dtype = np.float64)
+    if q.ndim == 1:
+        return points @ toMatrix(q).T
+    ### p + 2 w (u x p) + 2 u x (u x p), where u is the vector part of q.
+    w, u = q[..., :1], q[..., 1:]
+    t = 2 * np.cross(u, points)
+    return points + w * t + np.cross(u, t)
+
+
+def nlerp(p, q, t):
+    """ Normalised linear interpolation from p (t = 0) to q (t = 1) along
+        the shorter way; t is a number or has shape (N,).
+    """
+    p, q = unit(p), unit(q)
+    t = np.asarray(t, dtype = np.float64)[..., None]
+    q = np.where(np.sum(p * q, axis = -1, keepdims = True) < 0, -q, q)
+    return wrap(unit((1 - t) * p + t * q))
+
+
+def slerp(p, q, t):
+    """ Spherical linear interpolation from p (t = 0) to q (t = 1): rotation at
+        a constant speed along the shorter way. Nearly equal rotations are
+        interpolated with nlerp.
+    """
+    p, q = unit(p), unit(q)
+    t = np.asarray(t, dtype = np.float64)[..., None]
+    dot = np.sum(p * q, axis = -1, keepdims = True)
+    q = np.where(dot < 0, -q, q)
+    dot = np.minimum(np.abs(dot), 1.0)
+    angle = np.arccos(dot)
+    sine = np.sin(angle)
+    near = sine < 1e-6
+    safe = np.where(near, 1.0, sine)
+    a = np.where(near, 1 - t, np.sin((1 - t) * angle) / safe)
+    b = np.where(near, t, np.sin(t * angle) / safe)
+    return wrap(unit(a * p + b * q))
+
+
+def compose(chain):
+    """ The product chain[0] * chain[1] * ... * chain[N - 1] of the rotations, that is,
+        the rotation by chain[N - 1] first and chain[0] last. The products are taken
+        in pairs, so a chain of N rotations takes about log2(N) numpy operations.
+    """
+    q = unit(chain)
+    while len(q) > 1:
+        if len(q) % 2:
+            q = np.concatenate((q, [[1.0, 0.0, 0.0, 0.0]]))
+        ### Renormalise against the rounding errors accumulating in long chains.
+        q = unit(hamilton(q[0::2], q[1::2]))
+    return wrap(q[0])
+
+
+def accumulate(chain):
+    """ All the partial products chain[0] * ... * chain[k] of the rotations,
+        computed in about log2(N) numpy operations.
+    """
+    q = unit(chain).copy()
+    step = 1
+    while step < len(q):
+        q[step:] = unit(hamilton(q[:-step], q[step:]))
+        step *= 2
+    return QuaternionArray._new(q)
@@ -11,6 +11,7 @@ the game continues.
 
 import tkinter as tk
 from Boards import SlidingPuzzle
+from DistanceTables import find
 
 
 class SlidingPuzzleNormal(tk.Canvas):
@@ -21,6 +22,9 @@ class SlidingPuzzleNormal(tk.Canvas):
         self.puzzle = SlidingPuzzle(self.rows, self.columns)
         ### Count how many clicks a player needs to solve the puzzle.
         self.clicks = 0
+        ### The number of moves to solve is shown if a distance table has been built
+        ### for the board size (python DistanceTables.py 3 3); None otherwise.
+        self.distances = find(self.rows, self.columns)
 
         ### Initial values for the canvas
         
@@ -38,8 +42,9 @@ class SlidingPuzzleNormal(tk.Canvas):
         self.canvas.bind("<Button-1>", self.leftClick)
         self.canvas.bind("<Configure>", self.changeSize)
 
-        self.puzzle.shuffle()
+        self.puzzle.shuffle("permutation")
         self.printPuzzle()
+        self.showDistance()
 
     def printPiece(self, i, j):
         ### Find the coordinates of the upper left corner of the cell at (i, j)
@@ -88,10 +93,16 @@ class SlidingPuzzleNormal(tk.Canvas):
             self.clicks += 1
             self.puzzle.movePieces((i, j))
             self.printPuzzle()
+            self.showDistance()
 
         if self.puzzle.isSolved():
             self.printResult()
 
+    def showDistance(self):
+        if self.distances is not None:
+            moves = self.distances.distance(self.puzzle.tiles)
+            self.container.title(f"{self.rows} X {self.columns}: {moves} moves to solve")
+
     def printResult(self):
         self.canvas.delete("all")
         self.canvas.create_text(self.canvasSizeX / 2, self.canvasSizeY / 2,
@@ -128,7 +139,11 @@ class SlidingPuzzleExtreme(SlidingPuzzleNormal):
         SlidingPuzzleNormal.leftClick(self, event)
 
     def showHint(self, event):
-        i, j = self.puzzle.hint()[0], self.puzzle.hint()[1]
+        ### A solved board has no hint.
+        hint = self.puzzle.hint()
+        if hint is None:
+            return
+        i, j = hint
         self.printNumber(i, j)
 
 